@@ -2,34 +2,132 @@
 JWT Authentication Module for AcaRead API.
 Handles token creation, validation, and user session management.
 """
-import os
-import jwt
+import hmac
+import json
+import time
+import base64
+import hashlib
+import calendar
+import binascii
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from config import config
+
 # Configuration
-_jwt_secret_env = os.getenv("JWT_SECRET")
-if not _jwt_secret_env:
-    import warnings
-    warnings.warn(
-        "JWT_SECRET environment variable is not set. "
-        "Using auto-generated secret (tokens will invalidate on restart). "
-        "Set JWT_SECRET in .env for production.",
-        stacklevel=2,
-    )
-    import secrets as _secrets
-    _jwt_secret_env = _secrets.token_hex(32)
-
-JWT_SECRET = _jwt_secret_env
-JWT_ALGORITHM = "HS256"
-JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
+JWT_SECRET = config.jwt_secret
+JWT_ALGORITHM = config.jwt_algorithm
+JWT_EXPIRATION_HOURS = config.jwt_expiration_hours
+_JWT_EXP_DELTA = timedelta(hours=JWT_EXPIRATION_HOURS)
+_JWT_EXP_SECONDS = int(_JWT_EXP_DELTA.total_seconds())
+
+# Precomputed HS256 signing material
+_SECRET_BYTES = JWT_SECRET.encode()
+_HEADER_B64 = base64.urlsafe_b64encode(
+    json.dumps({"alg": JWT_ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode()
+).rstrip(b"=")
+
+# Validated-token cache: SHA-256(token) -> (payload, exp, cached_at)
+# Only successfully decoded tokens are cached; invalid tokens are always re-checked.
+JWT_CACHE_TTL = config.jwt_cache_ttl
+JWT_CACHE_MAX_SIZE = 10000
+_token_cache: "OrderedDict[bytes, Tuple[dict, float, float]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
 
 # Security scheme for Swagger UI
 security = HTTPBearer(auto_error=False)
 
 
+class InvalidTokenError(Exception):
+    """Token is malformed or its signature does not match."""
+    pass
+
+
+class ExpiredSignatureError(InvalidTokenError):
+    """Token signature is valid but the token has expired."""
+    pass
+
+
+def _b64url_encode(data: bytes) -> bytes:
+    """Base64url-encode without padding (RFC 7515)."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64url_decode(data: bytes) -> bytes:
+    """Base64url-decode, restoring stripped padding."""
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _hs256_sign(signing_input: bytes) -> bytes:
+    """Compute the raw HS256 signature for `header.payload`."""
+    return hmac.digest(_SECRET_BYTES, signing_input, "sha256")
+
+
+def _encode_hs256(payload: dict) -> str:
+    """Encode a payload as a compact HS256 JWT."""
+    claims = {
+        key: calendar.timegm(value.utctimetuple()) if isinstance(value, datetime) else value
+        for key, value in payload.items()
+    }
+    payload_b64 = _b64url_encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = _HEADER_B64 + b"." + payload_b64
+    return (signing_input + b"." + _b64url_encode(_hs256_sign(signing_input))).decode()
+
+
+def _decode_hs256(token: str) -> dict:
+    """
+    Verify an HS256 JWT and return its payload.
+
+    Raises:
+        ExpiredSignatureError: Signature is valid but `exp` has passed
+        InvalidTokenError: Token is malformed, uses another algorithm, or signature mismatch
+    """
+    try:
+        header_b64, payload_b64, sig_b64 = token.encode().split(b".")
+    except (ValueError, UnicodeEncodeError):
+        raise InvalidTokenError("Not enough segments")
+
+    try:
+        header = json.loads(_b64url_decode(header_b64))
+        signature = _b64url_decode(sig_b64)
+    except (ValueError, binascii.Error):
+        raise InvalidTokenError("Invalid header or signature padding")
+
+    if not isinstance(header, dict) or header.get("alg") != JWT_ALGORITHM:
+        raise InvalidTokenError("The specified alg value is not allowed")
+
+    expected = _hs256_sign(header_b64 + b"." + payload_b64)
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidTokenError("Signature verification failed")
+
+    try:
+        payload = json.loads(_b64url_decode(payload_b64))
+    except (ValueError, binascii.Error):
+        raise InvalidTokenError("Invalid payload padding")
+    if not isinstance(payload, dict):
+        raise InvalidTokenError("Invalid payload string: must be a json object")
+
+    now = time.time()
+    exp = payload.get("exp")
+    if exp is not None:
+        if not isinstance(exp, (int, float)):
+            raise InvalidTokenError("Expiration Time claim (exp) must be an integer.")
+        if exp <= now:
+            raise ExpiredSignatureError("Signature has expired")
+    nbf = payload.get("nbf")
+    if nbf is not None:
+        if not isinstance(nbf, (int, float)):
+            raise InvalidTokenError("Not Before claim (nbf) must be an integer.")
+        if nbf > now:
+            raise InvalidTokenError("The token is not yet valid (nbf)")
+
+    return payload
+
+
 def create_access_token(user_id: str, email: str, name: str = None) -> str:
     """
     Generate a JWT access token for authenticated user.
@@ -42,15 +140,16 @@ def create_access_token(user_id: str, email: str, name: str = None) -> str:
     Returns:
         JWT token string
     """
+    now = int(time.time())
     payload = {
         "sub": user_id,
         "email": email,
         "name": name,
-        "iat": datetime.utcnow(),
-        "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
+        "iat": now,
+        "exp": now + _JWT_EXP_SECONDS,
         "type": "access",
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return _encode_hs256(payload)
 
 
 def verify_token(token: str) -> Tuple[bool, Optional[dict], str]:
@@ -63,14 +162,34 @@ def verify_token(token: str) -> Tuple[bool, Optional[dict], str]:
     Returns:
         Tuple of (is_valid, payload, error_message)
     """
+    cache_key = hashlib.sha256(token.encode()).digest() if JWT_CACHE_TTL > 0 else None
+    if cache_key is not None:
+        now = time.time()
+        with _token_cache_lock:
+            entry = _token_cache.get(cache_key)
+            if entry is not None:
+                payload, exp, cached_at = entry
+                if exp > now and now - cached_at < JWT_CACHE_TTL:
+                    _token_cache.move_to_end(cache_key)
+                    return True, payload, ""
+                del _token_cache[cache_key]
+
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return True, payload, ""
-    except jwt.ExpiredSignatureError:
+        payload = _decode_hs256(token)
+    except ExpiredSignatureError:
         return False, None, "Token has expired"
-    except jwt.InvalidTokenError as e:
+    except InvalidTokenError as e:
         return False, None, f"Invalid token: {str(e)}"
 
+    exp = payload.get("exp")
+    if cache_key is not None and exp is not None:
+        with _token_cache_lock:
+            _token_cache[cache_key] = (payload, float(exp), time.time())
+            _token_cache.move_to_end(cache_key)
+            if len(_token_cache) > JWT_CACHE_MAX_SIZE:
+                _token_cache.popitem(last=False)
+    return True, payload, ""
+
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(security),
@@ -0,0 +1,61 @@
+"""
+Runtime configuration for AcaRead API.
+Environment variables are read once at import into a frozen Config instance.
+"""
+import os
+import secrets
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class Config:
+    """Immutable application settings."""
+    jwt_secret: str
+    database_url: str
+    data_dir: Path
+    extract_cache_dir: Path  # content-addressed markdown of previously extracted PDFs
+    jwt_algorithm: str = "HS256"
+    jwt_expiration_hours: int = 24 * 7  # 7 days
+    jwt_cache_ttl: int = 60  # seconds, 0 disables
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    max_upload_mb: int = 50
+    pdf_workers: int = 2  # extraction processes, each holding its own Docling models
+
+
+def _load_jwt_secret() -> str:
+    """Read JWT_SECRET or fall back to a per-process random secret."""
+    secret = os.getenv("JWT_SECRET")
+    if not secret:
+        warnings.warn(
+            "JWT_SECRET environment variable is not set. "
+            "Using auto-generated secret (tokens will invalidate on restart). "
+            "Set JWT_SECRET in .env for production.",
+            stacklevel=3,
+        )
+        secret = secrets.token_hex(32)
+    return secret
+
+
+def load_config() -> Config:
+    """Build Config from environment variables."""
+    return Config(
+        jwt_secret=_load_jwt_secret(),
+        database_url=os.getenv("DATABASE_URL", "sqlite:///./data/acaread.db"),
+        data_dir=Path("data"),
+        extract_cache_dir=Path(os.getenv("EXTRACT_CACHE_DIR", "data/extract_cache")),
+        jwt_cache_ttl=int(os.getenv("JWT_CACHE_TTL", "60")),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "40")),
+        max_upload_mb=int(os.getenv("MAX_UPLOAD_MB", "50")),
+        pdf_workers=int(os.getenv("PDF_WORKERS", "2")),
+    )
+
+
+# Global config instance
+config = load_config()
@@ -2,37 +2,103 @@
 Database Models for AcaRead
 SQLite-based user and session management with SQLAlchemy ORM.
 """
-import os
 import secrets
 import string
 from datetime import datetime
-from typing import Optional
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Boolean, Float, Text, ForeignKey
+from typing import List, Optional
+from sqlalchemy import create_engine, event, update, func, Index, Column, String, Integer, DateTime, Boolean, Float, Text, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship
+
+from config import config
 
 # Database configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/acaread.db")
+DATABASE_URL = config.database_url
 
 # Ensure data directory exists
-os.makedirs("data", exist_ok=True)
+if not config.data_dir.exists():
+    config.data_dir.mkdir(parents=True, exist_ok=True)
+
+# Connection pool settings (ignored for in-memory SQLite, which uses a single shared connection)
+_engine_kwargs = {}
+if ":memory:" not in DATABASE_URL:
+    _engine_kwargs.update(
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_recycle=3600,
+        pool_pre_ping=True,
+    )
+
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **_engine_kwargs)
+
+# SQLite tuning: WAL lets readers run alongside the writer, NORMAL sync drops
+# the per-commit fsync of the WAL, and mmap/cache keep hot pages out of read().
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "mmap_size=268435456",
+    "cache_size=-65536",
+    "temp_store=MEMORY",
+)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+        cursor = dbapi_conn.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Thread-scoped sessions for background jobs; release with SessionLocal.remove()
+SessionLocal = scoped_session(_session_factory)
 Base = declarative_base()
 
 
+_ID_ALPHABET = (string.ascii_lowercase + string.digits).encode()
+# Largest multiple of the alphabet size below 256; bytes at or above it are
+# rejected so every character stays uniformly distributed.
+_ID_BYTE_LIMIT = 256 - 256 % len(_ID_ALPHABET)
+
+
 def generate_short_id(length: int = 6) -> str:
     """Generate a short alphanumeric ID."""
-    alphabet = string.ascii_lowercase + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    out = bytearray()
+    while len(out) < length:
+        # Oversample so a single CSPRNG draw almost always suffices
+        for b in secrets.token_bytes(length * 2):
+            if b < _ID_BYTE_LIMIT:
+                out.append(_ID_ALPHABET[b % len(_ID_ALPHABET)])
+                if len(out) == length:
+                    break
+    return out.decode()
+
+
+def _serialize(obj, fields: tuple) -> dict:
+    """
+    Build a response dict from a precomputed field spec.
+    
+    Each entry is (key, attribute_name) or (key, nested_field_spec).
+    Datetimes become ISO strings, so the result is plain-json serializable.
+    """
+    out = {}
+    for key, attr in fields:
+        if isinstance(attr, tuple):
+            out[key] = _serialize(obj, attr)
+            continue
+        value = getattr(obj, attr)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        out[key] = value
+    return out
 
 
 class User(Base):
     """User account model."""
     __tablename__ = "users"
 
-    id = Column(String(8), primary_key=True, index=True)  # Short 6-char ID
+    id = Column(String(8), primary_key=True)  # Short 6-char ID
     email = Column(String(255), unique=True, index=True, nullable=False)
     name = Column(String(255), nullable=True)
     image = Column(Text, nullable=True)
@@ -52,7 +118,7 @@ class User(Base):
     # Free: 20 credits/week, Create: 2 credits, Edit: 1 credit
     credits_balance = Column(Integer, default=20)  # Current credits
     credits_weekly_limit = Column(Integer, default=20)  # Weekly limit based on plan
-    credits_week_start = Column(DateTime, default=datetime.utcnow)  # Start of current week
+    credits_week_start = Column(DateTime, default=func.now(), server_default=func.now())  # Start of current week
     credits_total_used = Column(Integer, default=0)  # Lifetime credits used
     
     # Usage tracking
@@ -61,48 +127,109 @@ class User(Base):
     storage_used_mb = Column(Float, default=0.0)
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
     last_login_at = Column(DateTime, nullable=True)
     
     # Relationships
     exam_sessions = relationship("ExamSession", back_populates="user", cascade="all, delete-orphan")
     exam_results = relationship("ExamResult", back_populates="user", cascade="all, delete-orphan")
 
+    @classmethod
+    def increment_counters(cls, db, user_id: str, **deltas: int) -> bool:
+        """
+        Atomically add deltas to counter columns in a single UPDATE.
+        
+        Usage:
+            User.increment_counters(db, user_id, total_sessions=1)
+        
+        Returns:
+            True if the user row exists
+        """
+        values = {name: getattr(cls, name) + delta for name, delta in deltas.items()}
+        result = db.execute(update(cls).where(cls.id == user_id).values(**values))
+        db.commit()
+        return result.rowcount > 0
+
+    @classmethod
+    def debit_credits(cls, db, user_id: str, amount: int) -> Optional[int]:
+        """
+        Atomically deduct credits if the balance covers them.
+        
+        Returns:
+            Remaining balance, or None if the user is missing or the balance is too low
+        """
+        row = db.execute(
+            update(cls)
+            .where(cls.id == user_id, cls.credits_balance >= amount)
+            .values(
+                credits_balance=cls.credits_balance - amount,
+                credits_total_used=cls.credits_total_used + amount,
+            )
+            .returning(cls.credits_balance)
+        ).fetchone()
+        db.commit()
+        return row[0] if row else None
+
+    @classmethod
+    def reset_weekly_credits(cls, db, now: datetime, cutoff: datetime) -> List[str]:
+        """
+        Refill every balance whose credit week started before cutoff, in one UPDATE.
+        
+        Returns:
+            IDs of the users that were reset
+        """
+        rows = db.execute(
+            update(cls)
+            .where(cls.credits_week_start < cutoff)
+            .values(credits_balance=cls.credits_weekly_limit, credits_week_start=now)
+            .returning(cls.id)
+        ).fetchall()
+        db.commit()
+        return [row[0] for row in rows]
+
+    _DICT_FIELDS = (
+        ("id", "id"),
+        ("email", "email"),
+        ("name", "name"),
+        ("image", "image"),
+        ("is_active", "is_active"),
+        ("plan", (
+            ("type", "plan_type"),
+            ("exams_limit", "plan_exams_limit"),
+            ("exams_used", "plan_exams_used"),
+            ("started_at", "plan_started_at"),
+            ("expires_at", "plan_expires_at"),
+        )),
+        ("credits", (
+            ("balance", "credits_balance"),
+            ("weekly_limit", "credits_weekly_limit"),
+            ("week_start", "credits_week_start"),
+            ("total_used", "credits_total_used"),
+        )),
+        ("total_exams_created", "total_exams_created"),
+        ("total_sessions", "total_sessions"),
+        ("storage_used_mb", "storage_used_mb"),
+        ("created_at", "created_at"),
+        ("last_login_at", "last_login_at"),
+    )
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "email": self.email,
-            "name": self.name,
-            "image": self.image,
-            "is_active": self.is_active,
-            "plan": {
-                "type": self.plan_type,
-                "exams_limit": self.plan_exams_limit,
-                "exams_used": self.plan_exams_used,
-                "started_at": self.plan_started_at.isoformat() if self.plan_started_at else None,
-                "expires_at": self.plan_expires_at.isoformat() if self.plan_expires_at else None,
-            },
-            "credits": {
-                "balance": self.credits_balance,
-                "weekly_limit": self.credits_weekly_limit,
-                "week_start": self.credits_week_start.isoformat() if self.credits_week_start else None,
-                "total_used": self.credits_total_used,
-            },
-            "total_exams_created": self.total_exams_created,
-            "total_sessions": self.total_sessions,
-            "storage_used_mb": self.storage_used_mb,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "last_login_at": self.last_login_at.isoformat() if self.last_login_at else None,
-        }
+        return _serialize(self, self._DICT_FIELDS)
 
 
 class ExamSession(Base):
     """Exam generation session linked to user."""
     __tablename__ = "exam_sessions"
+    # Serves "my sessions, newest first" as an index range scan (also covers user_id lookups)
+    # Stats counts (has_exam, this month) are answered from the second index alone
+    __table_args__ = (
+        Index("ix_exam_sessions_user_created", "user_id", "created_at"),
+        Index("ix_exam_sessions_user_exam_created", "user_id", "has_exam", "created_at"),
+    )
 
-    id = Column(String(36), primary_key=True, index=True)
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=True, index=True)
+    id = Column(String(8), primary_key=True)  # Short 8-char session ID
+    user_id = Column(String(8), ForeignKey("users.id"), nullable=True)
     
     # Session info
     filename = Column(String(255), nullable=True)
@@ -120,39 +247,48 @@ class ExamSession(Base):
     has_answers = Column(Boolean, default=False)
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="exam_sessions")
     results = relationship("ExamResult", back_populates="session", cascade="all, delete-orphan")
 
+    _DICT_FIELDS = tuple((name, name) for name in (
+        "id", "user_id", "filename", "source_type", "word_count", "exam_type",
+        "passage_type", "total_questions", "status", "has_exam", "has_answers",
+        "created_at", "completed_at",
+    ))
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "filename": self.filename,
-            "source_type": self.source_type,
-            "word_count": self.word_count,
-            "exam_type": self.exam_type,
-            "passage_type": self.passage_type,
-            "total_questions": self.total_questions,
-            "status": self.status,
-            "has_exam": self.has_exam,
-            "has_answers": self.has_answers,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
-        }
+        return _serialize(self, self._DICT_FIELDS)
+
+    @classmethod
+    def update_fields(cls, db, session_id: str, **values) -> bool:
+        """
+        Set columns on a session row in a single UPDATE (no SELECT first).
+        
+        Usage:
+            ExamSession.update_fields(db, session_id, status="failed")
+        
+        Returns:
+            True if the session row exists
+        """
+        result = db.execute(update(cls).where(cls.id == session_id).values(**values))
+        db.commit()
+        return result.rowcount > 0
 
 
 class ExamResult(Base):
     """User exam attempt result."""
     __tablename__ = "exam_results"
+    # Serves "my results, latest first" as an index range scan (also covers user_id lookups)
+    __table_args__ = (Index("ix_exam_results_user_completed", "user_id", "completed_at"),)
 
-    id = Column(String(36), primary_key=True, index=True)
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
-    session_id = Column(String(36), ForeignKey("exam_sessions.id"), nullable=False, index=True)
+    id = Column(String(8), primary_key=True)  # Short 8-char ID
+    user_id = Column(String(8), ForeignKey("users.id"), nullable=False)
+    session_id = Column(String(8), ForeignKey("exam_sessions.id"), nullable=False, index=True)
     
     # Score tracking
     total_questions = Column(Integer, default=0)
@@ -166,41 +302,44 @@ class ExamResult(Base):
     user_answers = Column(Text, nullable=True)
     
     # Timestamps
-    started_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=func.now(), server_default=func.now())
     completed_at = Column(DateTime, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="exam_results")
     session = relationship("ExamSession", back_populates="results")
 
+    _DICT_FIELDS = tuple((name, name) for name in (
+        "id", "user_id", "session_id", "total_questions", "correct_answers",
+        "score_percentage", "time_spent_seconds", "started_at", "completed_at",
+    ))
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "session_id": self.session_id,
-            "total_questions": self.total_questions,
-            "correct_answers": self.correct_answers,
-            "score_percentage": self.score_percentage,
-            "time_spent_seconds": self.time_spent_seconds,
-            "started_at": self.started_at.isoformat() if self.started_at else None,
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
-        }
+        return _serialize(self, self._DICT_FIELDS)
+
+
+_initialized = False
 
 
 def init_db():
-    """Initialize database tables."""
+    """Initialize database tables (idempotent, call once at startup)."""
+    global _initialized
+    if _initialized:
+        return
     Base.metadata.create_all(bind=engine)
+    _initialized = True
     print("[Database] Tables created successfully")
 
 
 def get_db():
-    """Get database session."""
-    db = SessionLocal()
+    """
+    Get database session.
+
+    Uses a fresh (non thread-scoped) session: FastAPI may run dependency
+    setup and teardown on different threadpool workers.
+    """
+    db = _session_factory()
     try:
         yield db
     finally:
         db.close()
-
-
-# Initialize database on import
-init_db()
@@ -5,8 +5,10 @@ Modular approach: Preprocess -> Generate Passage -> Plan Questions -> Generate Q
 """
 import os
 import re
-import json
 import random
+import orjson
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Any, List, Optional, Tuple, Callable
 from pathlib import Path
 
@@ -77,6 +79,110 @@ QUESTION_TYPES = {
         "max_questions": 5,
     },
 }
+_AVAILABLE_TYPES = tuple(QUESTION_TYPES)
+
+# Word count targets by passage type
+PASSAGE_WORD_TARGETS = {
+    1: (700, 900),
+    2: (700, 1000),
+    3: (750, 1200),
+}
+
+PASSAGE_STYLES = {
+    1: "General interest, factual",
+    2: "Problem/solution focus",
+    3: "Abstract, argumentative, research-based",
+}
+
+# Maximum source characters embedded in the passage prompt
+MAX_SOURCE_CHARS = 8000
+
+_PASSAGE_PROMPT_TEMPLATE = """You are an IELTS exam writer. Create a reading passage based on the source material below.
+
+REQUIREMENTS:
+- Write a coherent, academic passage between {min_words}-{max_words} words
+- Passage Type {passage_type}: {passage_style}
+- Use formal academic English
+- Structure with clear paragraphs (label them A, B, C, etc. for reference)
+- Do NOT include any questions
+- Output ONLY valid JSON matching the schema
+
+SOURCE MATERIAL:
+{source_content}
+
+OUTPUT SCHEMA:
+{schema_prompt}
+
+Return ONLY the JSON object, no explanation."""
+
+# Common reference section headers, combined so one scan finds the earliest
+_REFERENCE_SECTION_RE = re.compile(
+    r"\n##?\s*(?:References?|Bibliography|Works?\s*Cited|Literature|Sources?|Tài liệu tham khảo)\s*\n",
+    re.IGNORECASE,
+)
+_FOOTNOTE_RE = re.compile(r"\[\d+\]")
+_EXCESS_NEWLINES_RE = re.compile(r"\n{3,}")
+
+
+# Answer fields in priority order; which one is present depends on the question schema
+_ANSWER_KEYS = (
+    "correct_answer",
+    "answer",
+    "correct_feature_id",
+    "correct_heading_id",
+    "correct_paragraph",
+    "correct_ending_id",
+)
+
+
+def _extract_answer(question: Dict[str, Any]) -> Any:
+    """Return the first truthy answer field of a question (last field's value otherwise)."""
+    value = None
+    for key in _ANSWER_KEYS:
+        value = question.get(key)
+        if value:
+            return value
+    return value
+
+
+@lru_cache(maxsize=64)
+def _read_schema_bytes(schema_path: str) -> bytes:
+    """Read a schema file once per process (schemas do not change at runtime)."""
+    with open(schema_path, "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=64)
+def _schema_prompt_text(schema_path: str) -> str:
+    """Pretty-printed schema as embedded in generation prompts."""
+    schema = orjson.loads(_read_schema_bytes(schema_path))
+    return orjson.dumps(schema, option=orjson.OPT_INDENT_2).decode()
+
+
+# Characters split per step in count_words; bounds the transient token list
+WORD_COUNT_CHUNK_CHARS = 64 * 1024
+
+
+def count_words(text: str) -> int:
+    """
+    Count whitespace-separated words without materializing every token.
+    
+    Splits fixed-size slices with str.split() (C speed, Unicode whitespace) and
+    subtracts words that straddle a slice boundary, so peak memory stays bounded
+    on multi-MB extracted documents.
+    """
+    if len(text) <= WORD_COUNT_CHUNK_CHARS:
+        return len(text.split())
+    
+    total = 0
+    prev_ends_in_word = False
+    for i in range(0, len(text), WORD_COUNT_CHUNK_CHARS):
+        chunk = text[i:i + WORD_COUNT_CHUNK_CHARS]
+        total += len(chunk.split())
+        if prev_ends_in_word and not chunk[0].isspace():
+            total -= 1
+        prev_ends_in_word = not chunk[-1].isspace()
+    return total
 
 
 class IELTSPipeline:
@@ -109,46 +215,31 @@ class IELTSPipeline:
         Returns:
             Cleaned content without references
         """
-        # Common reference section headers
-        reference_patterns = [
-            r"\n##?\s*References?\s*\n",
-            r"\n##?\s*Bibliography\s*\n",
-            r"\n##?\s*Works?\s*Cited\s*\n",
-            r"\n##?\s*Literature\s*\n",
-            r"\n##?\s*Sources?\s*\n",
-            r"\n##?\s*Tài liệu tham khảo\s*\n",
-        ]
-        
-        # Find the earliest reference section
-        earliest_pos = len(content)
-        for pattern in reference_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match and match.start() < earliest_pos:
-                earliest_pos = match.start()
-        
-        # Cut content at reference section
-        cleaned = content[:earliest_pos].strip()
+        # Cut content at the earliest reference section
+        match = _REFERENCE_SECTION_RE.search(content)
+        cut_pos = match.start() if match else len(content)
+        cleaned = content[:cut_pos].strip()
         
         # Also remove footnote-style references like [1], [2], etc.
-        cleaned = re.sub(r'\[\d+\]', '', cleaned)
+        cleaned = _FOOTNOTE_RE.sub('', cleaned)
         
         # Remove excessive whitespace
-        cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+        cleaned = _EXCESS_NEWLINES_RE.sub('\n\n', cleaned)
         
         return cleaned
 
     def count_words(self, text: str) -> int:
-        """Count words in text."""
-        return len(text.split())
+        """
+        Count words in text.
+        
+        Delegates to the module-level count_words; str.split() on bounded
+        slices stays faster than regex scanning while avoiding an O(tokens) list.
+        """
+        return count_words(text)
 
     # =========================================================================
     # STAGE 2: PASSAGE GENERATION
     # =========================================================================
-    def _load_schema(self, schema_path: str) -> Dict[str, Any]:
-        """Load JSON schema from file."""
-        with open(schema_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
     def generate_passage(
         self,
         source_content: str,
@@ -165,35 +256,26 @@ class IELTSPipeline:
             Generated passage dict with title, content, topic
         """
         schema_file = os.path.join(self.passages_dir, f"passage{passage_type}_schema.json")
-        schema = self._load_schema(schema_file)
+        schema_prompt = _schema_prompt_text(schema_file)
         
-        # Word count targets by passage type
-        word_targets = {
-            1: (700, 900),
-            2: (700, 1000),
-            3: (750, 1200),
-        }
-        min_words, max_words = word_targets.get(passage_type, (700, 1000))
+        min_words, max_words = PASSAGE_WORD_TARGETS.get(passage_type, (700, 1000))
         
-        prompt = f"""You are an IELTS exam writer. Create a reading passage based on the source material below.
-
-REQUIREMENTS:
-- Write a coherent, academic passage between {min_words}-{max_words} words
-- Passage Type {passage_type}: {"General interest, factual" if passage_type == 1 else "Problem/solution focus" if passage_type == 2 else "Abstract, argumentative, research-based"}
-- Use formal academic English
-- Structure with clear paragraphs (label them A, B, C, etc. for reference)
-- Do NOT include any questions
-- Output ONLY valid JSON matching the schema
-
-SOURCE MATERIAL:
-{source_content[:8000]}
-
-OUTPUT SCHEMA:
-{json.dumps(schema, indent=2)}
-
-Return ONLY the JSON object, no explanation."""
+        # Only copy the source when it actually exceeds the prompt budget
+        if len(source_content) > MAX_SOURCE_CHARS:
+            source_content = source_content[:MAX_SOURCE_CHARS]
+        
+        prompt = _PASSAGE_PROMPT_TEMPLATE.format(
+            min_words=min_words,
+            max_words=max_words,
+            passage_type=passage_type,
+            passage_style=PASSAGE_STYLES.get(passage_type, PASSAGE_STYLES[3]),
+            source_content=source_content,
+            schema_prompt=schema_prompt,
+        )
 
-        result = self.llm.invoke_json(prompt, schema=schema)
+        # Pass the rendered schema text so invoke_json does not re-serialize it.
+        # Never cached: regenerate must get a new passage for the same source.
+        result = self.llm.invoke_json(prompt, schema=schema_prompt, cache=False)
         
         # Validate word count
         if "content" in result:
@@ -228,8 +310,7 @@ Return ONLY the JSON object, no explanation."""
         num_types = max(2, min(3, num_types))
         
         # Randomly select question types
-        available_types = list(QUESTION_TYPES.keys())
-        selected_types = random.sample(available_types, num_types)
+        selected_types = random.sample(_AVAILABLE_TYPES, num_types)
         
         # Distribute questions
         base_count = total_questions // num_types
@@ -281,8 +362,41 @@ Return ONLY the JSON object, no explanation."""
         Returns:
             Generated questions matching the schema
         """
+        prompt, schema = self._build_question_prompt(passage, task_config)
+        result = self.llm.invoke_json(prompt, schema=schema, cache=False)
+        return self._check_question_count(result, task_config)
+
+    async def agenerate_questions(
+        self,
+        passage: Dict[str, Any],
+        tasks: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate questions for all tasks concurrently via the async LLM client.
+        
+        Args:
+            passage: The generated passage
+            tasks: Task configurations from planning stage
+            
+        Returns:
+            Generated questions per task, in task order
+        """
+        built = [self._build_question_prompt(passage, task) for task in tasks]
+        results = await self.llm.batch_invoke_json(
+            [prompt for prompt, _ in built],
+            [schema for _, schema in built],
+            cache=False,
+        )
+        return [self._check_question_count(r, t) for r, t in zip(results, tasks)]
+
+    def _build_question_prompt(
+        self,
+        passage: Dict[str, Any],
+        task_config: Dict[str, Any],
+    ) -> Tuple[str, str]:
+        """Build the question-generation prompt and rendered schema text for one task."""
         schema_path = os.path.join(self.schema_dir, task_config["schema_file"])
-        schema = self._load_schema(schema_path)
+        schema_prompt = _schema_prompt_text(schema_path)
         
         type_name = task_config["type_name"]
         count = task_config["question_count"]
@@ -303,12 +417,16 @@ REQUIREMENTS:
 - Output ONLY valid JSON matching the schema
 
 OUTPUT SCHEMA:
-{json.dumps(schema, indent=2)}
+{schema_prompt}
 
 Return ONLY the JSON object, no explanation."""
 
-        result = self.llm.invoke_json(prompt, schema=schema)
-        
+        return prompt, schema_prompt
+
+    @staticmethod
+    def _check_question_count(result: Dict[str, Any], task_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Warn when the model returned a different number of questions than requested."""
+        count = task_config["question_count"]
         # Validate question count
         if "questions" in result:
             actual_count = len(result["questions"])
@@ -341,24 +459,15 @@ Return ONLY the JSON object, no explanation."""
             
             questions = task.get("questions", [])
             for q in questions:
-                # Check for various answer keys depending on schema
-                answer_val = (
-                    q.get("correct_answer") or 
-                    q.get("answer") or 
-                    q.get("correct_feature_id") or 
-                    q.get("correct_heading_id") or 
-                    q.get("correct_paragraph") or
-                    q.get("correct_ending_id")
-                )
-                
                 answer_entry = {
                     "question": question_num,
-                    "answer": answer_val,
+                    "answer": _extract_answer(q),
                 }
                 
                 # Include explanation if available
-                if "explanation" in q:
-                    answer_entry["explanation"] = q["explanation"]
+                explanation = q.get("explanation")
+                if explanation is not None:
+                    answer_entry["explanation"] = explanation
                 
                 task_answers["answers"].append(answer_entry)
                 question_num += 1
@@ -428,20 +537,27 @@ Return ONLY the JSON object, no explanation."""
 
         # Stage 4: Question Generation
         print("\n[Stage 4] Generating questions...")
-        question_sections = []
+        # Tasks only share the read-only passage, so generate them concurrently
         total_tasks = len(tasks)
-        for i, task in enumerate(tasks):
-            print(f"  - Generating {task['type_name']}...")
-            questions = self.generate_questions_for_task(passage, task)
-            question_sections.append({
-                "task_type": task["type_name"],
-                "task_key": task["type_key"],
-                **questions
-            })
-            if progress_callback:
-                # Calculate progress between 60% and 90% based on tasks done
-                current_percent = 60 + int((i + 1) / total_tasks * 30)
-                progress_callback("generating_questions", current_percent)
+        question_sections: List[Optional[Dict[str, Any]]] = [None] * total_tasks
+        with ThreadPoolExecutor(max_workers=max(1, total_tasks)) as executor:
+            futures = {}
+            for i, task in enumerate(tasks):
+                print(f"  - Generating {task['type_name']}...")
+                futures[executor.submit(self.generate_questions_for_task, passage, task)] = i
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                task = tasks[i]
+                question_sections[i] = {
+                    "task_type": task["type_name"],
+                    "task_key": task["type_key"],
+                    **future.result()
+                }
+                if progress_callback:
+                    # Calculate progress between 60% and 90% based on tasks done
+                    current_percent = 60 + int(done / total_tasks * 30)
+                    progress_callback("generating_questions", current_percent)
         
         if progress_callback:
             progress_callback("finalizing", 95)
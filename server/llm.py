@@ -1,6 +1,13 @@
 import os
-from typing import Dict, List, Any, Optional, Union, TypeVar
+import time
+import logging
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Union, TypeVar, Tuple
 import json
+import orjson
 from langchain_google_genai import GoogleGenerativeAI
 from langchain_google_genai import HarmBlockThreshold, HarmCategory
 from dotenv import load_dotenv
@@ -11,6 +18,109 @@ load_dotenv()
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+# Response cleanup pattern used by invoke_json
+# One pass: line comments, block comments, and trailing commas (which may be
+# followed by comments) before a closing bracket; sub(r"\1") keeps only the bracket
+_RE_JSON_CLEANUP = re.compile(
+    r"//[^\n]*|/\*.*?\*/|,(?:\s|//[^\n]*|/\*.*?\*/)*([}\]])",
+    re.DOTALL,
+)
+_JSON_DECODER = json.JSONDecoder()
+
+# Prompt templates for invoke_json (filled with str.format_map)
+_JSON_PROMPT_TEMPLATE = """
+You are a strictly compliant JSON generator.
+Task: Answer the user's request and output the result as a VALID JSON object.
+
+Schema Requirement:
+{schema}
+
+User Request: {prompt}
+
+CRITICAL JSON RULES:
+1. Output MUST be valid JSON.
+2. Escape ALL double quotes within string values (e.g., "content": "He said \\"Hello\\"").
+3. Do NOT include any text before or after the JSON.
+4. Do NOT use markdown code blocks (like ```json), just raw JSON.
+5. Ensure the JSON is complete and not truncated.
+"""
+
+_REPAIR_PROMPT_TEMPLATE = """
+ERROR: Your previous response was NOT valid JSON.
+Error specific: {error}
+
+FIX INSTRUCTIONS:
+1. Review the error and fix the syntax.
+2. Specifically check for unescaped double quotes inside strings.
+3. Ensure all brackets {{}} and [] are closed.
+4. Output RAW JSON ONLY.
+
+User Request: {prompt}
+"""
+
+# Exact-match response cache for low-temperature calls (identical prompt -> identical answer).
+# Opt-in per call (cache=True): generation must return fresh output on regenerate.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))  # seconds, 0 disables
+LLM_CACHE_MAX_SIZE = 256
+LLM_CACHE_MAX_TEMPERATURE = 0.3  # sampled outputs above this are never cached
+_response_cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+# Upper bound on in-flight async Gemini calls (rate-limit guard)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "5"))
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Shared semaphore, created on first use inside the running loop."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _strip_code_fence(text: str) -> str:
+    """Return the body of the first ```json (or plain ```) block, if any."""
+    start = text.find("```json")
+    if start != -1:
+        start += len("```json")
+        end = text.find("```", start)
+        # Fallback if closing fence is missing: keep everything after the opener
+        return (text[start:end] if end != -1 else text[start:]).strip()
+
+    start = text.find("```")
+    if start != -1:
+        start += len("```")
+        end = text.find("```", start)
+        if end != -1:
+            return text[start:end].strip()
+    return text
+
+
+def _loads_tolerant(text: str) -> Any:
+    """
+    Parse JSON strictly with orjson, falling back to the first complete value.
+    
+    Models sometimes add prose before or after the object; raw_decode recovers
+    the leading object/array instead of forcing a full retry. The original
+    parse error is raised if no object or array can be recovered.
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as strict_error:
+        starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+        if starts:
+            try:
+                obj, _ = _JSON_DECODER.raw_decode(text, min(starts))
+            except json.JSONDecodeError:
+                pass
+            else:
+                if isinstance(obj, (dict, list)):
+                    return obj
+        raise strict_error
+
 
 class LLM:
     """Simple wrapper class for Google Gemini API with JSON schema support."""
@@ -57,7 +167,7 @@ class LLM:
             with open(file_path, "r", encoding="utf-8") as f:
                 return f.read()
         except Exception as e:
-            print(f"Cannot read system prompt file: {e}")
+            logger.warning("Cannot read system prompt file: %s", e)
             return None
 
     def _initialize_llm(self) -> GoogleGenerativeAI:
@@ -85,121 +195,223 @@ class LLM:
             safety_settings=safety_settings,
         )
 
+    def _cache_key(
+        self, prompt: str, stop: Optional[List[str]], kwargs: Dict[str, Any]
+    ) -> Optional[bytes]:
+        """Cache key for a call, or None if the call must not be cached."""
+        if LLM_CACHE_TTL <= 0:
+            return None
+        if kwargs.get("temperature", self.temperature) >= LLM_CACHE_MAX_TEMPERATURE:
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self.model_name, prompt, repr(stop), repr(sorted(kwargs.items()))):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def _cache_get(self, cache_key: Optional[bytes]) -> Optional[str]:
+        """Return a fresh cached response for cache_key, if any."""
+        if cache_key is None:
+            return None
+        now = time.time()
+        with _response_cache_lock:
+            entry = _response_cache.get(cache_key)
+            if entry is not None:
+                response, cached_at = entry
+                if now - cached_at < LLM_CACHE_TTL:
+                    _response_cache.move_to_end(cache_key)
+                    return response
+                del _response_cache[cache_key]
+        return None
+
+    def _cache_put(self, cache_key: Optional[bytes], response: str) -> None:
+        """Store a response under cache_key, evicting the oldest entry when full."""
+        if cache_key is None:
+            return
+        with _response_cache_lock:
+            _response_cache[cache_key] = (response, time.time())
+            _response_cache.move_to_end(cache_key)
+            if len(_response_cache) > LLM_CACHE_MAX_SIZE:
+                _response_cache.popitem(last=False)
+
     def invoke(
-        self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        cache: bool = False,
+        **kwargs: Any,
+    ) -> str:
+        """Call the model with a prompt; cache=True reuses an identical recent answer."""
+        if self.system_prompt:
+            prompt = f"{self.system_prompt}\n\n{prompt}"
+
+        cache_key = self._cache_key(prompt, stop, kwargs) if cache else None
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        response = self._llm.invoke(prompt, stop=stop, **kwargs)
+        self._cache_put(cache_key, response)
+        return response
+
+    async def ainvoke(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        cache: bool = False,
+        **kwargs: Any,
     ) -> str:
-        """Call the model with a prompt."""
+        """Async call to the model; at most GEMINI_MAX_CONCURRENCY run at once."""
+        if self.system_prompt:
+            prompt = f"{self.system_prompt}\n\n{prompt}"
+
+        cache_key = self._cache_key(prompt, stop, kwargs) if cache else None
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        async with _get_semaphore():
+            response = await self._llm.ainvoke(prompt, stop=stop, **kwargs)
+        self._cache_put(cache_key, response)
+        return response
+
+    def _discard_cached(
+        self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> None:
+        """Drop a cached response (e.g. one that failed to parse)."""
         if self.system_prompt:
             prompt = f"{self.system_prompt}\n\n{prompt}"
+        cache_key = self._cache_key(prompt, stop, kwargs)
+        if cache_key is not None:
+            with _response_cache_lock:
+                _response_cache.pop(cache_key, None)
+
+    @staticmethod
+    def _build_json_prompt(prompt: str, schema: Optional[Union[Dict[str, Any], str]]) -> str:
+        """Wrap a user prompt with the JSON output contract."""
+        if isinstance(schema, str):
+            schema_str = schema  # already rendered by the caller
+        elif schema:
+            schema_str = orjson.dumps(schema, option=orjson.OPT_INDENT_2).decode()
+        else:
+            schema_str = "Any valid JSON object"
+        return _JSON_PROMPT_TEMPLATE.format_map({"schema": schema_str, "prompt": prompt})
+
+    @staticmethod
+    def _build_repair_prompt(prompt: str, error: Exception) -> str:
+        """Follow-up prompt asking the model to fix its invalid JSON."""
+        return _REPAIR_PROMPT_TEMPLATE.format_map({"error": str(error), "prompt": prompt})
 
-        return self._llm.invoke(prompt, stop=stop, **kwargs)
+    @staticmethod
+    def _parse_json_response(response: str, type_hint: Optional[type] = None) -> Union[Dict[str, Any], T]:
+        """Clean a raw model response and parse it as JSON."""
+        # Process result to extract JSON
+        result_text = response.strip()
+
+        # Robust cleaning of markdown blocks
+        result_text = _strip_code_fence(result_text)
+
+        # Clean comments and trailing commas (common error)
+        result_text = _RE_JSON_CLEANUP.sub(r"\1", result_text)
+
+        # Try to parse JSON
+        json_result = _loads_tolerant(result_text)
+        
+        if type_hint:
+            from pydantic import parse_obj_as
+            return parse_obj_as(type_hint, json_result)
+        return json_result
 
     def invoke_json(
         self,
         prompt: str,
-        schema: Optional[Dict[str, Any]] = None,
+        schema: Optional[Union[Dict[str, Any], str]] = None,
         type_hint: Optional[type] = None,
         max_retries: int = 3,
+        cache: bool = False,
         **kwargs: Any,
     ) -> Union[Dict[str, Any], T]:
         """
         Call the model and parse response as JSON.
-        """
-        # Create prompt requesting JSON format response
-        schema_str = json.dumps(schema, indent=2, ensure_ascii=False) if schema else "Any valid JSON object"
         
-        json_prompt = f"""
-You are a strictly compliant JSON generator.
-Task: Answer the user's request and output the result as a VALID JSON object.
+        schema may be a dict or its already-rendered prompt text.
+        cache=True reuses identical recent answers, repair attempts included.
+        """
+        json_prompt = self._build_json_prompt(prompt, schema)
+        # Override temperature to be lower for valid JSON generation
+        kwargs["temperature"] = 0.1
 
-Schema Requirement:
-{schema_str}
+        last_error = None
+        for attempt in range(1, max_retries + 2):
+            try:
+                response = self.invoke(json_prompt, cache=cache, **kwargs)
+                return self._parse_json_response(response, type_hint)
+            except Exception as e:
+                last_error = e
+                logger.warning("JSON Parse Error (Attempt %d/%d): %s", attempt, max_retries, e)
+                # Never serve an unparseable response from the cache again
+                if cache:
+                    self._discard_cached(json_prompt, **kwargs)
+                json_prompt = self._build_repair_prompt(prompt, e)
 
-User Request: {prompt}
+        # If all retries have been used
+        raise ValueError(
+            f"Cannot parse JSON after {max_retries} retries: {str(last_error)}"
+        )
 
-CRITICAL JSON RULES:
-1. Output MUST be valid JSON.
-2. Escape ALL double quotes within string values (e.g., "content": "He said \\"Hello\\"").
-3. Do NOT include any text before or after the JSON.
-4. Do NOT use markdown code blocks (like ```json), just raw JSON.
-5. Ensure the JSON is complete and not truncated.
-"""
+    async def ainvoke_json(
+        self,
+        prompt: str,
+        schema: Optional[Union[Dict[str, Any], str]] = None,
+        type_hint: Optional[type] = None,
+        max_retries: int = 3,
+        cache: bool = False,
+        **kwargs: Any,
+    ) -> Union[Dict[str, Any], T]:
+        """
+        Async variant of invoke_json.
+        """
+        json_prompt = self._build_json_prompt(prompt, schema)
+        kwargs["temperature"] = 0.1
 
-        retry_count = 0
         last_error = None
-        result_text = ""
-
-        while retry_count <= max_retries:
+        for attempt in range(1, max_retries + 2):
             try:
-                # Call model
-                # Override temperature to be lower for valid JSON generation
-                kwargs["temperature"] = 0.1 
-                response = self.invoke(json_prompt, **kwargs)
-                
-                # Process result to extract JSON
-                result_text = response.strip()
-
-                # Robust cleaning of markdown blocks
-                if "```json" in result_text:
-                    pattern = r"```json(.*?)```"
-                    matches = re.findall(pattern, result_text, re.DOTALL)
-                    if matches:
-                        result_text = matches[0].strip()
-                    else:
-                        # Fallback if closing fence is missing
-                        result_text = result_text.split("```json")[1].strip()
-                elif "```" in result_text:
-                     pattern = r"```(.*?)```"
-                     matches = re.findall(pattern, result_text, re.DOTALL)
-                     if matches:
-                        result_text = matches[0].strip()
-
-                # Clean comments
-                result_text = re.sub(r"//.*", "", result_text)
-                result_text = re.sub(r"/\*.*?\*/", "", result_text, flags=re.DOTALL)
-                
-                # Clean trailing commas (common error)
-                result_text = re.sub(r",\s*}", "}", result_text)
-                result_text = re.sub(r",\s*]", "]", result_text)
-
-                # Try to parse JSON
-                json_result = json.loads(result_text)
-                
-                # If successful, return result
-                if type_hint:
-                    from pydantic import parse_obj_as
-                    return parse_obj_as(type_hint, json_result)
-                return json_result
-                
+                response = await self.ainvoke(json_prompt, cache=cache, **kwargs)
+                return self._parse_json_response(response, type_hint)
             except Exception as e:
                 last_error = e
-                retry_count += 1
-                print(f"JSON Parse Error (Attempt {retry_count}/{max_retries}): {str(e)}")
-                # print(f"Failed JSON snippet: {result_text[:100]}...") # Debug log
-                
-                # If error and retries remaining, simplify the prompt
-                if retry_count <= max_retries:
-                    error_msg = str(e)
-                    json_prompt = f"""
-ERROR: Your previous response was NOT valid JSON.
-Error specific: {error_msg}
+                logger.warning("JSON Parse Error (Attempt %d/%d): %s", attempt, max_retries, e)
+                if cache:
+                    self._discard_cached(json_prompt, **kwargs)
+                json_prompt = self._build_repair_prompt(prompt, e)
 
-FIX INSTRUCTIONS:
-1. Review the error and fix the syntax.
-2. Specifically check for unescaped double quotes inside strings.
-3. Ensure all brackets {{}} and [] are closed.
-4. Output RAW JSON ONLY.
-
-User Request: {prompt}
-"""
-                else:
-                    break  # Exit loop to raise error
-
-        # If all retries have been used
         raise ValueError(
             f"Cannot parse JSON after {max_retries} retries: {str(last_error)}"
         )
 
+    async def batch_invoke_json(
+        self,
+        prompts: List[str],
+        schemas: Optional[Union[Dict[str, Any], str, List[Optional[Union[Dict[str, Any], str]]]]] = None,
+        **kwargs: Any,
+    ) -> List[Union[Dict[str, Any], T]]:
+        """
+        Run several invoke_json calls concurrently.
+        
+        Args:
+            prompts: User prompts to send
+            schemas: One schema shared by all prompts, or one schema per prompt
+            
+        Returns:
+            Parsed results in the same order as prompts
+        """
+        if schemas is None or isinstance(schemas, (dict, str)):
+            schemas = [schemas] * len(prompts)
+        return await asyncio.gather(*(
+            self.ainvoke_json(p, schema=sch, **kwargs) for p, sch in zip(prompts, schemas)
+        ))
+
     @classmethod
     def from_defaults(cls):
         """Create instance with default configuration."""
@@ -5,228 +5,253 @@ PDF Extractor using Docling library with fallback methods.
 import os
 import sys
 import re
+import tempfile
+import threading
+import logging
+import importlib
+import importlib.util
 import urllib.parse
+from functools import lru_cache
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
+# Download buffer size; larger chunks amortise per-write syscall cost
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def _optional_module(name: str):
+    """Import an optional extraction backend once; None if it is not installed."""
+    if importlib.util.find_spec(name) is None:
+        logger.debug("%s not installed", name)
+        return None
+    try:
+        return importlib.import_module(name)
+    except Exception as e:
+        logger.warning("%s failed to import: %s", name, e)
+        return None
+
+
+@lru_cache(maxsize=256)
+def _derive_output_name(source: str) -> str:
+    """Markdown filename for a source path or URL (pure, so memoized)."""
+    if source.startswith(("http://", "https://")):
+        parsed = urllib.parse.urlparse(source)
+        file_name = os.path.basename(parsed.path)
+        if not file_name or "." not in file_name:
+            file_name = parsed.hostname.replace(".", "_") + ".pdf"
+    else:
+        file_name = os.path.basename(source)
+    
+    base_name, _ = os.path.splitext(file_name)
+    return f"{base_name}.md"
+
+
+@lru_cache(maxsize=8)
+def _base64_image_re(min_length: int) -> "re.Pattern":
+    """Compiled inline base64 image pattern, cached per min_length."""
+    return re.compile(rf'!\[[^\]]*\]\(data:image/[^;]+;base64,[A-Za-z0-9+/=]{{{min_length},}}\)')
+
 
 class PDFExtractor:
     """
     Extract PDF content to Markdown using Docling library.
     Falls back to pymupdf4llm or other methods if Docling fails.
+    
+    Stateless apart from the shared converter: every method takes its input
+    and returns its result, so one instance can serve concurrent requests.
     """
     
     _docling_converter = None  # Singleton instance
-    
-    def __init__(self):
-        """Initialize PDFExtractor with global DocumentConverter."""
-        self.markdown_content = None
-        self.source_path = None
-        self.clean_images = True
-        self.use_fallback = False
-
-        # Initialize global DocumentConverter if not already done
-        if PDFExtractor._docling_converter is None:
-            try:
-                print("pdf_extractor: Initializing global DocumentConverter...")
-                from docling.document_converter import DocumentConverter
-                PDFExtractor._docling_converter = DocumentConverter()
-                print("pdf_extractor: DocumentConverter initialized successfully")
-            except ImportError:
-                print("pdf_extractor: docling library not found. Will use fallback.")
-            except Exception as e:
-                print(f"pdf_extractor: Error initializing DocumentConverter: {e}")
+    _docling_init_done = False
+    _docling_init_lock = threading.Lock()
+
+    @classmethod
+    def _ensure_converter(cls):
+        """
+        Initialize the global DocumentConverter on first use.
+        
+        Loading Docling's models takes seconds, so this is kept out of import
+        time; the server loads it once in each extraction worker process. Concurrent
+        callers wait for the one in-flight initialization.
+        
+        Returns:
+            The shared DocumentConverter, or None if Docling is unavailable
+        """
+        if cls._docling_init_done:
+            return cls._docling_converter
+        with cls._docling_init_lock:
+            if not cls._docling_init_done:
+                try:
+                    logger.info("Initializing global DocumentConverter...")
+                    from docling.document_converter import DocumentConverter
+                    cls._docling_converter = DocumentConverter()
+                    logger.info("DocumentConverter initialized successfully")
+                except ImportError:
+                    logger.warning("docling library not found. Will use fallback.")
+                except Exception as e:
+                    logger.error("Error initializing DocumentConverter: %s", e)
+                cls._docling_init_done = True
+        return cls._docling_converter
 
     def extract_from_file(self, file_path: str) -> str:
         """Extract content from local PDF file."""
-        self.source_path = file_path
-        
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
         # Try Docling first
-        if PDFExtractor._docling_converter:
+        converter = self._ensure_converter()
+        if converter:
             try:
-                print(f"pdf_extractor: Extracting with Docling: {file_path}")
-                result = PDFExtractor._docling_converter.convert(file_path)
-                self.markdown_content = result.document.export_to_markdown()
-                print("pdf_extractor: Docling extraction successful")
-                return self.markdown_content
+                logger.debug("Extracting with Docling: %s", file_path)
+                result = converter.convert(file_path)
+                markdown_content = result.document.export_to_markdown()
+                logger.info("Docling extraction successful")
+                return markdown_content
             except Exception as e:
-                print(f"pdf_extractor: Docling failed: {e}")
-                print("pdf_extractor: Trying fallback...")
+                logger.warning("Docling failed: %s", e)
+                logger.debug("Trying fallback...")
         
         # Fallback
-        self.use_fallback = True
-        self.markdown_content = self._extract_text_fallback(file_path)
-        return self.markdown_content
+        return self._extract_text_fallback(file_path)
 
     def extract_from_url(self, url: str) -> str:
         """Extract content from PDF URL."""
-        self.source_path = url
-        
         # Try Docling first (it can handle URLs directly)
-        if PDFExtractor._docling_converter:
+        converter = self._ensure_converter()
+        if converter:
             try:
-                print(f"pdf_extractor: Extracting URL with Docling: {url}")
-                result = PDFExtractor._docling_converter.convert(url)
-                self.markdown_content = result.document.export_to_markdown()
-                print("pdf_extractor: Docling URL extraction successful")
-                return self.markdown_content
+                logger.debug("Extracting URL with Docling: %s", url)
+                result = converter.convert(url)
+                markdown_content = result.document.export_to_markdown()
+                logger.info("Docling URL extraction successful")
+                return markdown_content
             except Exception as e:
-                print(f"pdf_extractor: Docling URL failed: {e}")
+                logger.warning("Docling URL failed: %s", e)
         
         # Fallback: download and extract locally
-        print("pdf_extractor: Downloading PDF for fallback extraction...")
-        self.use_fallback = True
+        logger.debug("Downloading PDF for fallback extraction...")
         
         import requests
-        temp_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_download.pdf")
+        # Private temp file per call so concurrent downloads never collide
+        fd, temp_file = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
         
         try:
             r = requests.get(url, stream=True, timeout=60)
             r.raise_for_status()
             with open(temp_file, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     f.write(chunk)
             
-            self.markdown_content = self._extract_text_fallback(temp_file)
-            
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                
-            return self.markdown_content
+            return self._extract_text_fallback(temp_file)
         except Exception as e:
+            raise RuntimeError(f"Cannot download/extract PDF from URL: {e}")
+        finally:
             if os.path.exists(temp_file):
                 os.remove(temp_file)
-            raise RuntimeError(f"Cannot download/extract PDF from URL: {e}")
 
     def _extract_text_fallback(self, file_path: str) -> str:
         """Fallback extraction using pymupdf4llm or other libraries."""
         extracted_text = ""
         
         # Try pymupdf4llm (best for LLM)
-        try:
-            import pymupdf4llm
-            print("pdf_extractor: Trying pymupdf4llm...")
-            return pymupdf4llm.to_markdown(file_path)
-        except ImportError:
-            print("pdf_extractor: pymupdf4llm not installed")
-        except Exception as e:
-            print(f"pdf_extractor: pymupdf4llm failed: {e}")
+        pymupdf4llm = _optional_module("pymupdf4llm")
+        if pymupdf4llm:
+            try:
+                logger.debug("Trying pymupdf4llm...")
+                return pymupdf4llm.to_markdown(file_path)
+            except Exception as e:
+                logger.warning("pymupdf4llm failed: %s", e)
 
         # Try fitz (PyMuPDF)
-        try:
-            import fitz
-            print("pdf_extractor: Trying fitz (PyMuPDF)...")
-            doc = fitz.open(file_path)
-            for page in doc:
-                extracted_text += page.get_text() + "\n\n"
-            doc.close()
-            
-            if extracted_text.strip():
-                print("pdf_extractor: fitz extraction successful")
-                return f"# Extracted Content\n\n{extracted_text}"
-        except ImportError:
-            print("pdf_extractor: fitz not installed")
-        except Exception as e:
-            print(f"pdf_extractor: fitz failed: {e}")
+        fitz = _optional_module("fitz")
+        if fitz:
+            try:
+                logger.debug("Trying fitz (PyMuPDF)...")
+                with fitz.open(file_path) as doc:
+                    extracted_text = "".join(page.get_text() + "\n\n" for page in doc)
+                
+                if extracted_text.strip():
+                    logger.info("fitz extraction successful")
+                    return f"# Extracted Content\n\n{extracted_text}"
+            except Exception as e:
+                logger.warning("fitz failed: %s", e)
         
         # Try PyPDF2
-        try:
-            import PyPDF2
-            print("pdf_extractor: Trying PyPDF2...")
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                for page in pdf_reader.pages:
-                    extracted_text += page.extract_text() + "\n\n"
-            
-            if extracted_text.strip():
-                print("pdf_extractor: PyPDF2 extraction successful")
-                return f"# Extracted Content\n\n{extracted_text}"
-        except ImportError:
-            print("pdf_extractor: PyPDF2 not installed")
-        except Exception as e:
-            print(f"pdf_extractor: PyPDF2 failed: {e}")
+        PyPDF2 = _optional_module("PyPDF2")
+        if PyPDF2:
+            try:
+                logger.debug("Trying PyPDF2...")
+                with open(file_path, 'rb') as f:
+                    pdf_reader = PyPDF2.PdfReader(f)
+                    extracted_text = "".join(page.extract_text() + "\n\n" for page in pdf_reader.pages)
+                
+                if extracted_text.strip():
+                    logger.info("PyPDF2 extraction successful")
+                    return f"# Extracted Content\n\n{extracted_text}"
+            except Exception as e:
+                logger.warning("PyPDF2 failed: %s", e)
         
         # Try pdfplumber
-        try:
-            import pdfplumber
-            print("pdf_extractor: Trying pdfplumber...")
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        extracted_text += text + "\n\n"
-            
-            if extracted_text.strip():
-                print("pdf_extractor: pdfplumber extraction successful")
-                return f"# Extracted Content\n\n{extracted_text}"
-        except ImportError:
-            print("pdf_extractor: pdfplumber not installed")
-        except Exception as e:
-            print(f"pdf_extractor: pdfplumber failed: {e}")
+        pdfplumber = _optional_module("pdfplumber")
+        if pdfplumber:
+            try:
+                logger.debug("Trying pdfplumber...")
+                with pdfplumber.open(file_path) as pdf:
+                    texts = (page.extract_text() for page in pdf.pages)
+                    extracted_text = "".join(text + "\n\n" for text in texts if text)
+                
+                if extracted_text.strip():
+                    logger.info("pdfplumber extraction successful")
+                    return f"# Extracted Content\n\n{extracted_text}"
+            except Exception as e:
+                logger.warning("pdfplumber failed: %s", e)
         
         if not extracted_text.strip():
             raise RuntimeError("All PDF extraction methods failed")
         
         return extracted_text
 
-    def clean_base64_images(self, min_length: int = 100) -> str:
+    @staticmethod
+    def clean_base64_images(content: str, min_length: int = 100) -> str:
         """Remove base64 encoded images from markdown content."""
-        if not self.markdown_content:
-            raise ValueError("No content to clean. Extract first.")
-        
-        pattern = rf'!\[.*?\]\(data:image\/[^;]+;base64,[a-zA-Z0-9+/=]{{{min_length},}}\)'
-        self.markdown_content = re.sub(pattern, '[Image removed]', self.markdown_content)
-        
-        return self.markdown_content
+        return _base64_image_re(min_length).sub('[Image removed]', content)
 
-    def get_output_filename(self) -> str:
-        """Generate output filename from source path."""
-        if not self.source_path:
+    @staticmethod
+    def get_output_filename(source: str) -> str:
+        """Generate output filename from source path or URL."""
+        if not source:
             raise ValueError("No source path set")
-        
-        if self.source_path.startswith(("http://", "https://")):
-            parsed = urllib.parse.urlparse(self.source_path)
-            file_name = os.path.basename(parsed.path)
-            if not file_name or "." not in file_name:
-                file_name = parsed.hostname.replace(".", "_") + ".pdf"
-        else:
-            file_name = os.path.basename(self.source_path)
-        
-        base_name, _ = os.path.splitext(file_name)
-        return f"{base_name}.md"
+        return _derive_output_name(source)
 
-    def save_markdown(self, output_path: Optional[str] = None) -> str:
+    def save_markdown(self, content: str, output_path: str, clean_images: bool = True) -> str:
         """Save extracted markdown to file."""
-        if not self.markdown_content:
+        if not content:
             raise ValueError("No content to save. Extract first.")
         
-        if not output_path:
-            output_path = self.get_output_filename()
-        
-        if self.clean_images:
-            self.clean_base64_images()
+        if clean_images:
+            content = self.clean_base64_images(content)
         
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write(self.markdown_content)
+            f.write(content)
         
         return output_path
 
     def process(self, source: str, output_path: Optional[str] = None, clean_images: bool = True) -> str:
         """Full process: extract and save."""
-        self.clean_images = clean_images
-        
         if source.startswith(("http://", "https://")):
-            self.extract_from_url(source)
+            content = self.extract_from_url(source)
         else:
-            self.extract_from_file(source)
+            content = self.extract_from_file(source)
         
-        return self.save_markdown(output_path)
+        return self.save_markdown(content, output_path or self.get_output_filename(source), clean_images)
 
 
 def main():
     """CLI entry point."""
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
     if len(sys.argv) < 2:
         print("Usage: python pdf_extractor.py <file_or_url> [output_path]")
         sys.exit(1)
@@ -0,0 +1,67 @@
+"""
+PDF extraction entry points for server.PDF_EXEC worker processes.
+
+The pool uses "spawn", so workers import these functions by reference. This
+module must stay free of import side effects (no app, clients or session
+state): importing server.py instead would rebuild the whole API per worker.
+"""
+import os
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+
+from pdf_extractor import PDFExtractor
+
+logger = logging.getLogger(__name__)
+
+# One extractor per worker process; its Docling converter is loaded by init_worker
+_extractor = PDFExtractor()
+
+
+def init_worker() -> bool:
+    """Load Docling models once per extraction worker process."""
+    return PDFExtractor._ensure_converter() is not None
+
+
+def file_digest(path: str) -> str:
+    """BLAKE2b hex digest of a file's contents."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "blake2b").hexdigest()
+        h = hashlib.blake2b()
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+        return h.hexdigest()
+
+
+def extract_pdf(source_path: str, cache_dir: str) -> str:
+    """Synchronous PDF extraction (runs in a PDF_EXEC worker process).
+
+    Results are cached by content hash under cache_dir, so re-uploads of the
+    same PDF skip Docling entirely.
+    """
+    cache_dir = Path(cache_dir)
+    cache_path = cache_dir / f"{file_digest(source_path)}.md"
+    try:
+        return cache_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        pass
+
+    markdown_content = _extractor.extract_from_file(source_path)
+    markdown_content = PDFExtractor.clean_base64_images(markdown_content)
+
+    tmp_path = None
+    try:
+        # Write to a temp file and rename so readers never see a partial entry
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(markdown_content)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("[ExtractCache] Failed to store %s: %s", cache_path.name, e)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return markdown_content
@@ -5,14 +5,24 @@ Clean implementation with organized session management, validation, and auto-cle
 Security: IDOR protection, SSRF blocking, answer stripping, auth enforcement.
 """
 import os
-import json
 import shutil
 import uvicorn
 import asyncio
-import requests
-import traceback
+import orjson
+import httpx
+import aiofiles
 import logging
+import logging.handlers
+import queue
+import atexit
 import ipaddress
+import socket
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache
 from urllib.parse import urlparse
 from datetime import datetime
 from dotenv import load_dotenv
@@ -31,25 +41,39 @@ class StatusEndpointFilter(logging.Filter):
 
 
 logging.getLogger("uvicorn.access").addFilter(StatusEndpointFilter())
-import copy
+
+# Application loggers (server, pdf_extractor, llm); LOG_LEVEL=DEBUG shows per-attempt detail.
+# Records go through a queue so request threads never block on stream writes;
+# a listener thread does the formatting and I/O.
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter("%(levelname)s:     %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.getLogger().setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger("acaread.server")
 from typing import Optional, List
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from fastapi import Depends
-from pdf_extractor import PDFExtractor
-from ielts_pipeline import IELTSPipeline
+import pdf_worker
+from ielts_pipeline import IELTSPipeline, count_words
 from session_manager import session_manager
 
 # Database imports
-from database import get_db, SessionLocal, ExamSession as DBExamSession
+from database import get_db, init_db, SessionLocal, ExamSession as DBExamSession
 from user_service import UserService, ExamResultService
 from sqlalchemy.orm import Session
 from auth import create_access_token, require_auth, optional_auth
 from llm import LLM
+from config import config
 
 # Import utilities
 try:
@@ -59,7 +83,7 @@ try:
 except ImportError:
     HAS_UTILS = False
     exam_validator = None
-    print("Warning: utils not available")
+    logger.warning("utils not available")
 
 
 # ============================================================================
@@ -105,9 +129,40 @@ class SubmitExamRequest(BaseModel):
 # ============================================================================
 # APP LIFECYCLE
 # ============================================================================
+CREDIT_RESET_INTERVAL_MINUTES = 60
+CLEANUP_POLL_MINUTES = 6 * 60  # safety poll; new sessions trigger cleanup sooner
+
+
+def _run_credit_reset() -> int:
+    """Refill expired credit weeks on a background-job session."""
+    db = SessionLocal()
+    try:
+        return UserService.reset_weekly_credits(db)
+    finally:
+        SessionLocal.remove()
+
+
+async def periodic_credit_reset(interval_minutes: int = CREDIT_RESET_INTERVAL_MINUTES):
+    """Reset weekly credits in bulk (at startup, then every interval)."""
+    while True:
+        try:
+            reset = await asyncio.to_thread(_run_credit_reset)
+            if reset:
+                logger.info("[Credits] Weekly credits reset for %d user(s)", reset)
+        except Exception as e:
+            logger.error("[Credits] Weekly reset failed: %s", e)
+        await asyncio.sleep(interval_minutes * 60)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle startup and shutdown events."""
+    # Startup: Create database tables
+    init_db()
+    
+    # Startup: Spawn a PDF worker (loading Docling models) in the background so the API is reachable immediately
+    app.state.docling_ready = asyncio.get_running_loop().run_in_executor(PDF_EXEC, pdf_worker.init_worker)
+    
     # Startup: Initialize cleanup task
     cleanup_task = None
     if HAS_UTILS:
@@ -117,20 +172,43 @@ async def lifespan(app: FastAPI):
             max_sessions=100,
             max_storage_mb=2048,
         )
-        cleanup_task = asyncio.create_task(periodic_cleanup(cleaner, interval_minutes=60))
-        print("[Server] Periodic cleanup task started")
+        app.state.session_cleaner = cleaner
+        # New sessions wake the cleaner near max_sessions; the poll catches aging
+        cleanup_task = asyncio.create_task(
+            periodic_cleanup(cleaner, interval_minutes=CLEANUP_POLL_MINUTES)
+        )
+        logger.info("[Server] Periodic cleanup task started")
+    
+    # Startup: Weekly credit refills run off the request path
+    credit_reset_task = asyncio.create_task(periodic_credit_reset())
     
     yield
     
     # Shutdown: Cancel cleanup task
     if cleanup_task:
         cleanup_task.cancel()
-        print("[Server] Cleanup task stopped")
+        logger.info("[Server] Cleanup task stopped")
+    credit_reset_task.cancel()
+    
+    # Shutdown: Persist buffered session metadata
+    session_manager.flush()
+    
+    # Shutdown: Close pooled HTTP connections
+    await HTTP_CLIENT.aclose()
+    
+    # Shutdown: Stop PDF extraction workers
+    PDF_EXEC.shutdown(wait=False, cancel_futures=True)
 
 
 # ============================================================================
 # FASTAPI APP
 # ============================================================================
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson (FastAPI's ORJSONResponse is deprecated)."""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
 app = FastAPI(
     title="AcaRead API",
     description="API for AcaRead - IELTS Exam Generator",
@@ -138,8 +216,25 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    default_response_class=OrjsonResponse,
 )
 
+# Upload size limit (registered before CORS so 413 responses still carry CORS headers)
+MAX_UPLOAD_BYTES = config.max_upload_mb * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    """Reject oversized request bodies from Content-Length before they are read."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        return OrjsonResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds {config.max_upload_mb} MB limit"},
+        )
+    return await call_next(request)
+
 # CORS Configuration
 # Allow both local development and production domains
 origins = [
@@ -161,32 +256,81 @@ app.add_middleware(
 # ============================================================================
 # GLOBAL INSTANCES
 # ============================================================================
-pdf_extractor = PDFExtractor()
+# Shared HTTP client for URL uploads: keep-alive pooling across requests
+# Downloads are written 1 MiB at a time to keep write syscalls few
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+HTTP_CLIENT = httpx.AsyncClient(
+    timeout=httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=5.0),
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    follow_redirects=False,  # redirects could bypass SSRF validation
+)
+
+
+# PDF extraction is CPU-bound: run it in separate processes so it scales past
+# the GIL and doesn't tie up the default thread pool. "spawn" avoids forking a
+# process that already has the event loop and logging threads running.
+# max_workers is the extraction memory bound: each worker keeps its own Docling
+# models resident and runs one extraction at a time, while further uploads
+# queue as path strings. Tune it with PDF_WORKERS, not a semaphore.
+PDF_EXEC = ProcessPoolExecutor(
+    max_workers=config.pdf_workers,
+    mp_context=multiprocessing.get_context("spawn"),
+    initializer=pdf_worker.init_worker,
+)
+
+
+@lru_cache(maxsize=1)
+def get_pipeline() -> IELTSPipeline:
+    """
+    Shared IELTS pipeline, built on first use.
+    
+    The pipeline keeps no per-request state, so one instance (and its LLM
+    client's connection pool and loaded system prompt) serves every request.
+    """
+    return IELTSPipeline(llm=LLM.with_system_prompt(system_prompt_file="system_prompt.md"))
 
 
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
-def count_words(text: str) -> int:
-    """Count words in text."""
-    return len(text.split())
+# Question fields that reveal the answer key
+ANSWER_FIELDS = frozenset({
+    "correct_answer",
+    "answer",
+    "explanation",
+    "correct_heading_id",
+    "correct_paragraph",
+    "correct_feature_id",
+})
 
 
-def strip_answers_from_exam(exam_data: dict) -> dict:
-    """Remove all answer-related fields from exam data before sending to client."""
-    sanitized = copy.deepcopy(exam_data)
+def _strip_answers_from_question(question: dict) -> dict:
+    """Drop answer fields; questions without any are returned as-is."""
+    if ANSWER_FIELDS.isdisjoint(question):
+        return question
+    return {k: v for k, v in question.items() if k not in ANSWER_FIELDS}
+
 
-    sanitized.pop("answers", None)
+def strip_answers_from_task(task: dict) -> dict:
+    """Return a task section with answer fields removed from its questions.
 
-    for task in sanitized.get("tasks", []):
-        for question in task.get("questions", []):
-            question.pop("correct_answer", None)
-            question.pop("answer", None)
-            question.pop("explanation", None)
-            question.pop("correct_heading_id", None)
-            question.pop("correct_paragraph", None)
-            question.pop("correct_feature_id", None)
+    Copy-on-write: the task is only copied when it has questions to rewrite.
+    """
+    questions = task.get("questions")
+    if not questions:
+        return task
+    return {**task, "questions": [_strip_answers_from_question(q) for q in questions]}
+
+
+def strip_answers_from_exam(exam_data: dict) -> dict:
+    """Remove all answer-related fields from exam data before sending to client.
 
+    Only the containers on the path to the questions are copied; untouched
+    values (e.g. the reading passage) are shared with exam_data.
+    """
+    sanitized = {k: v for k, v in exam_data.items() if k != "answers"}
+    if "tasks" in sanitized:
+        sanitized["tasks"] = [strip_answers_from_task(t) for t in sanitized["tasks"]]
     return sanitized
 
 
@@ -203,6 +347,37 @@ def verify_session_ownership(session_id: str, current_user: dict) -> dict:
     return session
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers etag (weak comparison, as for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in header.split(","))
+
+
+def _not_modified(etag: str) -> Response:
+    """Empty 304 for a client whose cached copy is current."""
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def _file_etag(st: os.stat_result) -> str:
+    """Strong ETag for a file that is only ever replaced whole."""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+async def get_owned_session(session_id: str, current_user: dict = Depends(require_auth)) -> dict:
+    """
+    Dependency resolving the path's session for its owner (404/403 otherwise).
+    
+    FastAPI caches dependency results per request, so the metadata is loaded
+    and checked once however many dependencies need it.
+    """
+    return verify_session_ownership(session_id, current_user)
+
+
 BLOCKED_IP_NETWORKS = [
     ipaddress.ip_network("127.0.0.0/8"),
     ipaddress.ip_network("10.0.0.0/8"),
@@ -215,11 +390,29 @@ BLOCKED_IP_NETWORKS = [
     ipaddress.ip_network("fe80::/10"),
 ]
 
+# (network, netmask) integer pairs per address family for mask-and-compare checks
+_BLOCKED_PREFIXES = {
+    family: tuple(
+        (int(net.network_address), int(net.netmask))
+        for net in BLOCKED_IP_NETWORKS
+        if net.version == version
+    )
+    for family, version in ((socket.AF_INET, 4), (socket.AF_INET6, 6))
+}
 
-def validate_url_safe(url: str) -> str:
-    """Validate URL is not targeting internal network resources (SSRF protection)."""
-    import socket
 
+def _is_blocked_address(family: int, address: str) -> bool:
+    """Check a resolved address against BLOCKED_IP_NETWORKS without building ipaddress objects."""
+    prefixes = _BLOCKED_PREFIXES.get(family)
+    if prefixes is None:
+        return False
+    # Drop IPv6 zone index (e.g. fe80::1%eth0) before packing
+    ip = int.from_bytes(socket.inet_pton(family, address.split("%", 1)[0]), "big")
+    return any(ip & mask == net for net, mask in prefixes)
+
+
+async def validate_url_safe(url: str) -> str:
+    """Validate URL is not targeting internal network resources (SSRF protection)."""
     parsed = urlparse(url)
 
     if parsed.scheme not in ("http", "https"):
@@ -234,26 +427,52 @@ def validate_url_safe(url: str) -> str:
         raise HTTPException(status_code=400, detail="URL targets a blocked host")
 
     try:
-        resolved_ips = socket.getaddrinfo(hostname, None)
+        # Resolved fresh on every call: a cached answer would widen the
+        # check-to-connect window and make DNS rebinding trivial
+        resolved_ips = await asyncio.get_running_loop().getaddrinfo(hostname, None)
         for family, _, _, _, sockaddr in resolved_ips:
-            ip = ipaddress.ip_address(sockaddr[0])
-            for network in BLOCKED_IP_NETWORKS:
-                if ip in network:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="URL resolves to a private/internal address",
-                    )
+            if _is_blocked_address(family, sockaddr[0]):
+                raise HTTPException(
+                    status_code=400,
+                    detail="URL resolves to a private/internal address",
+                )
     except socket.gaierror:
         raise HTTPException(status_code=400, detail=f"Cannot resolve hostname: {hostname}")
 
     return url
 
 
-def _sync_extract_pdf(source_path: str) -> str:
-    """Synchronous PDF extraction (runs in thread pool)."""
-    markdown_content = pdf_extractor.extract_from_file(source_path)
-    pdf_extractor.clean_base64_images()
-    return pdf_extractor.markdown_content
+# Types servers commonly send for PDFs; anything else is rejected up front
+PDF_CONTENT_TYPES = ("application/pdf", "application/x-pdf", "application/octet-stream")
+
+
+async def preflight_pdf_url(url: str) -> None:
+    """
+    HEAD the URL and reject oversized or non-PDF responses before downloading.
+    
+    Servers that don't answer HEAD (or omit the headers) are let through;
+    the streamed GET still enforces MAX_UPLOAD_BYTES.
+    """
+    try:
+        head = await HTTP_CLIENT.head(url)
+    except httpx.HTTPError:
+        return
+    if not head.is_success:
+        return
+    
+    content_length = head.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Remote file exceeds {config.max_upload_mb} MB limit",
+        )
+    
+    content_type = head.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type and content_type not in PDF_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f"URL does not point to a PDF (Content-Type: {content_type})",
+        )
 
 
 # ============================================================================
@@ -274,7 +493,7 @@ async def health_check():
 # AUTHENTICATION ENDPOINTS
 # ============================================================================
 @app.post("/api/v1/auth/google")
-async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db)):
+def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db)):
     """
     Handle Google OAuth callback from frontend.
     Creates or updates user in database and returns JWT token.
@@ -302,8 +521,7 @@ async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db))
             "token_type": "Bearer",
         }
     except Exception as e:
-        print(f"Error in Google auth: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in Google auth: %s", e)
         raise HTTPException(status_code=500, detail=f"Authentication error: {str(e)}")
 
 
@@ -311,22 +529,29 @@ async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db))
 # USER ENDPOINTS
 # ============================================================================
 @app.get("/api/v1/users/{user_id}")
-async def get_user(
+def get_user(
     user_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: dict = Depends(require_auth),
 ):
     """Get user by ID. Users can only access their own profile."""
     if user_id != current_user["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
-    user = UserService.get_user_by_id(db, user_id)
+    user = UserService.get_user_profile(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"user": user.to_dict()}
+    
+    # No cheap version column, so tag the encoded body (still saves the transfer)
+    body = orjson.dumps({"user": user})
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.get("/api/v1/users/{user_id}/stats")
-async def get_user_stats(
+def get_user_stats(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: dict = Depends(require_auth),
@@ -341,7 +566,7 @@ async def get_user_stats(
 
 
 @app.get("/api/v1/users/{user_id}/sessions")
-async def get_user_sessions(
+def get_user_sessions(
     user_id: str,
     limit: int = 20,
     offset: int = 0,
@@ -352,14 +577,16 @@ async def get_user_sessions(
     if user_id != current_user["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
     sessions = UserService.get_user_sessions(db, user_id, limit, offset)
-    return {
+    # Returned as a Response so orjson encodes rows (datetimes included) directly,
+    # without FastAPI's jsonable_encoder pass
+    return OrjsonResponse({
         "sessions": [s.to_dict() for s in sessions],
         "count": len(sessions),
-    }
+    })
 
 
 @app.get("/api/v1/users/{user_id}/results")
-async def get_user_results(
+def get_user_results(
     user_id: str,
     limit: int = 20,
     db: Session = Depends(get_db),
@@ -369,14 +596,14 @@ async def get_user_results(
     if user_id != current_user["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
     results = ExamResultService.get_user_results(db, user_id, limit)
-    return {
+    return OrjsonResponse({
         "results": [r.to_dict() for r in results],
         "count": len(results),
-    }
+    })
 
 
 @app.post("/api/v1/users/{user_id}/results")
-async def submit_result(
+def submit_result(
     user_id: str,
     request: SubmitResultRequest,
     db: Session = Depends(get_db),
@@ -400,12 +627,12 @@ async def submit_result(
             "result": result.to_dict(),
         }
     except Exception as e:
-        print(f"Error submitting result: {str(e)}")
+        logger.error("Error submitting result: %s", e)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
 @app.get("/api/v1/users/{user_id}/credits")
-async def get_user_credits(
+def get_user_credits(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: dict = Depends(require_auth),
@@ -424,7 +651,7 @@ async def get_user_credits(
 
 
 @app.post("/api/v1/users/{user_id}/credits/check")
-async def check_user_credits(
+def check_user_credits(
     user_id: str,
     action: str = "create",
     db: Session = Depends(get_db),
@@ -442,6 +669,51 @@ async def check_user_credits(
     }
 
 
+def _charge_create_credits(db: Session, user_id: str) -> int:
+    """Check and deduct document-creation credits (blocking DB work, run in a thread).
+
+    Returns:
+        Credits deducted
+    """
+    has_credits, balance, message = UserService.check_credits(db, user_id, "create")
+    if not has_credits:
+        raise HTTPException(
+            status_code=402,  # Payment Required
+            detail=f"Insufficient credits. {message}. Upgrade your plan or wait for weekly reset."
+        )
+    # Deduct credits
+    success, remaining, msg = UserService.use_credits(db, user_id, "create")
+    if success:
+        logger.info("[Credits] User %s used 2 credits. Remaining: %s", user_id, remaining)
+        return 2
+    return 0
+
+
+def _record_exam_session(
+    db: Session,
+    session_id: str,
+    user_id: str,
+    filename: str,
+    source_type: str,
+    word_count: int,
+) -> None:
+    """Persist the DB row for a new session (blocking DB work, run in a thread)."""
+    try:
+        db_session = DBExamSession(
+            id=session_id,
+            user_id=user_id,
+            filename=filename,
+            source_type=source_type,
+            word_count=word_count,
+            status="extracted",
+        )
+        db.add(db_session)
+        db.commit()
+        UserService.increment_user_session_count(db, user_id)
+    except Exception as db_error:
+        logger.warning("Failed to create DB session record: %s", db_error)
+
+
 @app.post("/api/v1/documents")
 async def create_document(
     pdf_file: Optional[UploadFile] = File(None),
@@ -477,75 +749,91 @@ async def create_document(
             if not filename.endswith(".pdf"):
                 filename += ".pdf"
         
+        # Validate the URL before charging credits or creating a session
+        if pdf_file is None:
+            await validate_url_safe(url)
+            await preflight_pdf_url(url)
+        
         # Check credits for logged-in users
         credits_used = 0
         if user_id:
-            has_credits, balance, message = UserService.check_credits(db, user_id, "create")
-            if not has_credits:
-                raise HTTPException(
-                    status_code=402,  # Payment Required
-                    detail=f"Insufficient credits. {message}. Upgrade your plan or wait for weekly reset."
-                )
-            # Deduct credits
-            success, remaining, msg = UserService.use_credits(db, user_id, "create")
-            if success:
-                credits_used = 2
-                print(f"[Credits] User {user_id} used 2 credits. Remaining: {remaining}")
+            credits_used = await asyncio.to_thread(_charge_create_credits, db, user_id)
         
         # Create session (organized by user folder)
         session_id = session_manager.create(filename=filename, source_type=source_type, user_id=user_id)
-        print(f"[{session_id}] Created session for: {filename} (user: {user_id or 'guest'})")
+        logger.info("[%s] Created session for: %s (user: %s)", session_id, filename, user_id or "guest")
+        cleaner = getattr(app.state, "session_cleaner", None)
+        if cleaner is not None:
+            cleaner.note_session_created()
         
         # Save source PDF
         source_path = session_manager.get_source_path(session_id)
         
         if pdf_file is not None:
-            content = await pdf_file.read()
-            await pdf_file.close()
-            session_manager.save_source(session_id, content)
+            # Copy in fixed-size chunks so memory stays flat regardless of file size
+            written = 0
+            try:
+                async with aiofiles.open(source_path, "wb") as out:
+                    while chunk := await pdf_file.read(UPLOAD_CHUNK_SIZE):
+                        written += len(chunk)
+                        if written > MAX_UPLOAD_BYTES:
+                            raise HTTPException(
+                                status_code=413,
+                                detail=f"Upload exceeds {config.max_upload_mb} MB limit",
+                            )
+                        await out.write(chunk)
+            except HTTPException:
+                session_manager.delete(session_id)
+                raise
+            finally:
+                await pdf_file.close()
+            session_manager.update_stage(session_id, "upload")
         else:
-            # Download from URL (with SSRF protection)
-            validate_url_safe(url)
+            # Download from URL (validated above); the byte counter covers
+            # servers that omit or misreport Content-Length
+            written = 0
             try:
-                response = requests.get(url, stream=True, timeout=60, allow_redirects=False)
-                response.raise_for_status()
-                with open(source_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                async with HTTP_CLIENT.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async with aiofiles.open(source_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            written += len(chunk)
+                            if written > MAX_UPLOAD_BYTES:
+                                raise HTTPException(
+                                    status_code=413,
+                                    detail=f"Remote file exceeds {config.max_upload_mb} MB limit",
+                                )
+                            await f.write(chunk)
                 session_manager.update_stage(session_id, "upload")
-            except requests.RequestException as e:
+            except HTTPException:
+                session_manager.delete(session_id)
+                raise
+            except httpx.HTTPError as e:
                 session_manager.delete(session_id)
                 raise HTTPException(
                     status_code=400,
                     detail=f"Error downloading PDF from URL: {str(e)}"
                 )
         
-        # Extract content (run in thread pool to avoid blocking event loop)
-        print(f"[{session_id}] Extracting PDF...")
+        # Extract content (run in a worker process to avoid blocking event loop)
+        logger.info("[%s] Extracting PDF...", session_id)
         session_manager.update(session_id, status="extracting", progress=10)
-        markdown_content = await asyncio.to_thread(_sync_extract_pdf, source_path)
+        loop = asyncio.get_running_loop()
+        markdown_content = await loop.run_in_executor(
+            PDF_EXEC, pdf_worker.extract_pdf, str(source_path), str(config.extract_cache_dir)
+        )
         
         word_count = count_words(markdown_content)
-        session_manager.save_extracted(session_id, markdown_content, word_count)
+        # Extracted markdown can be several MB; write it off the event loop
+        await asyncio.to_thread(session_manager.save_extracted, session_id, markdown_content, word_count)
         
-        print(f"[{session_id}] Extracted {word_count} words")
+        logger.info("[%s] Extracted %d words", session_id, word_count)
         
         # Create database record if user_id is provided
         if user_id:
-            try:
-                db_session = DBExamSession(
-                    id=session_id,
-                    user_id=user_id,
-                    filename=filename,
-                    source_type=source_type,
-                    word_count=word_count,
-                    status="extracted",
-                )
-                db.add(db_session)
-                db.commit()
-                UserService.increment_user_session_count(db, user_id)
-            except Exception as db_error:
-                print(f"Warning: Failed to create DB session record: {db_error}")
+            await asyncio.to_thread(
+                _record_exam_session, db, session_id, user_id, filename, source_type, word_count
+            )
         
         return {
             "session_id": session_id,
@@ -558,20 +846,24 @@ async def create_document(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error creating document: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error creating document: %s", e)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+# Minimum seconds between progress-only metadata writes during generation
+PROGRESS_WRITE_INTERVAL = 0.5
+
+
 def process_ielts_exam(
     session_id: str,
     passage_type: int,
     total_questions: int,
     num_question_types: Optional[int],
+    user_id: Optional[str] = None,
 ):
     """Background task to run IELTS pipeline."""
     try:
-        print(f"[{session_id}] Starting IELTS generation (Background)...")
+        logger.info("[%s] Starting IELTS generation (Background)...", session_id)
         
         # Save exam config and init status
         session_manager.update(session_id, 
@@ -587,17 +879,24 @@ def process_ielts_exam(
         # Load extracted content
         source_content = session_manager.load_extracted(session_id)
         if not source_content:
-            print(f"[{session_id}] No source content found")
+            logger.warning("[%s] No source content found", session_id)
             session_manager.update(session_id, status="failed", error="No source content")
             return
         
-        # Initialize pipeline
-        llm = LLM.with_system_prompt(system_prompt_file="system_prompt.md")
-        pipeline = IELTSPipeline(llm=llm)
+        pipeline = get_pipeline()
+        
+        # Progress callback: each update rewrites metadata.json, so percent-only
+        # updates within PROGRESS_WRITE_INTERVAL are dropped (stage changes never are)
+        last_stage = None
+        last_write = 0.0
         
-        # Progress callback
         def update_progress(stage: str, percent: int):
+            nonlocal last_stage, last_write
+            now = time.monotonic()
+            if stage == last_stage and percent < 100 and now - last_write < PROGRESS_WRITE_INTERVAL:
+                return
             session_manager.update(session_id, status=stage, progress=percent)
+            last_stage, last_write = stage, now
         
         # Execute pipeline
         result = pipeline.generate_exam(
@@ -608,53 +907,39 @@ def process_ielts_exam(
             progress_callback=update_progress
         )
         
-        # Save artifacts
-        if "reading_passage" in result:
-            session_manager.save_passage(session_id, result["reading_passage"])
-        
-        if "tasks" in result:
-            for i, task in enumerate(result["tasks"]):
-                session_manager.save_questions(session_id, i + 1, task)
-        
-        if "answers" in result:
-            session_manager.save_answers(session_id, result["answers"])
-        
-        # Save full exam (internal, contains answers for server-side use)
-        session_manager.save_exam(session_id, result)
+        # Save artifacts; the full exam (with answers) is internal, for server-side use
+        session_manager.save_exam_artifacts(session_id, result, strip_answers_from_exam(result))
         
         # Update database to mark exam as completed and available
-        from database import SessionLocal, ExamSession as DBExamSession
         db = SessionLocal()
         try:
-            db_session = db.query(DBExamSession).filter(DBExamSession.id == session_id).first()
-            if db_session:
-                db_session.has_exam = True
-                db_session.has_answers = True
-                db_session.status = "completed"
-                db_session.completed_at = datetime.utcnow()
-                db.commit()
+            DBExamSession.update_fields(
+                db, session_id,
+                has_exam=True,
+                has_answers=True,
+                status="completed",
+                completed_at=datetime.utcnow(),
+            )
         finally:
-            db.close()
+            SessionLocal.remove()
+        # has_exam feeds the owner's cached /stats counts
+        if user_id:
+            UserService.invalidate(user_id)
         
         # Final update in session manager
         session_manager.update(session_id, status="completed", progress=100)
-        print(f"[{session_id}] IELTS generation complete")
+        logger.info("[%s] IELTS generation complete", session_id)
         
     except Exception as e:
-        print(f"[{session_id}] Generation failed: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("[%s] Generation failed: %s", session_id, e)
         session_manager.update(session_id, status="failed", error=str(e))
         
         # Update database to mark as failed
-        from database import SessionLocal, ExamSession as DBExamSession
         db = SessionLocal()
         try:
-            db_session = db.query(DBExamSession).filter(DBExamSession.id == session_id).first()
-            if db_session:
-                db_session.status = "failed"
-                db.commit()
+            DBExamSession.update_fields(db, session_id, status="failed")
         finally:
-            db.close()
+            SessionLocal.remove()
 
 
 @app.post("/api/v1/exams/ielts/{session_id}")
@@ -662,14 +947,12 @@ async def create_ielts_exam(
     session_id: str,
     request: IELTSExamRequest,
     background_tasks: BackgroundTasks,
-    current_user: dict = Depends(require_auth),
+    session: dict = Depends(get_owned_session),
 ):
     """
     Initiate IELTS exam generation in background.
     Returns immediately with status 'processing'.
     """
-    session = verify_session_ownership(session_id, current_user)
-    
     # Validate parameters
     if request.passage_type not in [1, 2, 3]:
         raise HTTPException(status_code=400, detail="passage_type must be 1, 2, or 3")
@@ -687,6 +970,7 @@ async def create_ielts_exam(
         passage_type=request.passage_type,
         total_questions=request.total_questions,
         num_question_types=request.num_question_types,
+        user_id=session.get("user_id"),
     )
     
     return {
@@ -699,11 +983,9 @@ async def create_ielts_exam(
 @app.get("/api/v1/exams/{session_id}/status")
 async def get_exam_status(
     session_id: str,
-    current_user: dict = Depends(require_auth),
+    session: dict = Depends(get_owned_session),
 ):
     """Get status of exam generation."""
-    session = verify_session_ownership(session_id, current_user)
-    
     return {
         "session_id": session_id,
         "status": session.get("status", "unknown"),
@@ -712,24 +994,46 @@ async def get_exam_status(
     }
 
 
+def _sanitized_exam_stat(session_id: str) -> Optional[os.stat_result]:
+    """
+    Stat the client-facing exam JSON, written at generation time.
+    
+    Sessions generated before the sanitized copy existed get it built (and
+    stored) on first access. Returns None if there is no exam.
+    """
+    path = session_manager.get_sanitized_exam_path(session_id)
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        pass
+    exam = session_manager.load_exam(session_id)
+    if exam is None:
+        return None
+    session_manager.save_sanitized_exam(session_id, strip_answers_from_exam(exam))
+    return os.stat(path)
+
+
 @app.get("/api/v1/exams/{session_id}/download")
 async def download_exam(
     session_id: str,
-    current_user: dict = Depends(require_auth),
+    request: Request,
+    session: dict = Depends(get_owned_session),
 ):
     """Download generated exam as JSON file (answers stripped)."""
-    verify_session_ownership(session_id, current_user)
-    
-    exam = session_manager.load_exam(session_id)
-    if exam is None:
+    st = _sanitized_exam_stat(session_id)
+    if st is None:
         raise HTTPException(status_code=404, detail="Exam not found")
     
-    sanitized_exam = strip_answers_from_exam(exam)
+    etag = _file_etag(st)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
     
-    return JSONResponse(
-        content=sanitized_exam,
+    return FileResponse(
+        session_manager.get_sanitized_exam_path(session_id),
+        media_type="application/json",
         headers={
             "Content-Disposition": f'attachment; filename="exam_{session_id}.json"',
+            "ETag": etag,
         },
     )
 
@@ -737,12 +1041,11 @@ async def download_exam(
 @app.get("/api/v1/sessions/{session_id}")
 async def get_session(
     session_id: str,
-    current_user: dict = Depends(require_auth),
+    request: Request,
+    session: dict = Depends(get_owned_session),
 ):
     """Get session information."""
-    session = verify_session_ownership(session_id, current_user)
-    
-    return {
+    body = orjson.dumps({
         "session_id": session_id,
         "filename": session.get("filename"),
         "created_at": session.get("created_at"),
@@ -751,18 +1054,65 @@ async def get_session(
         "stages": session.get("stages"),
         "has_exam": session_manager.has_exam(session_id),
         "has_answers": session_manager.has_answers(session_id),
-    }
+    })
+    
+    # Tag the body itself: metadata timestamps are only second-resolution
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def _session_file_response(request: Request, path: str, media_type: str, filename: str) -> Response:
+    """Serve a session file straight from disk (sendfile) with a stat-based ETag."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    etag = _file_etag(st)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return FileResponse(path, media_type=media_type, filename=filename, headers={"ETag": etag})
+
+
+@app.get("/api/v1/sessions/{session_id}/source")
+async def get_session_source(
+    session_id: str,
+    request: Request,
+    session: dict = Depends(get_owned_session),
+):
+    """Download the uploaded source PDF."""
+    return _session_file_response(
+        request,
+        session_manager.get_source_path(session_id),
+        "application/pdf",
+        session.get("filename") or f"{session_id}.pdf",
+    )
+
+
+@app.get("/api/v1/sessions/{session_id}/extracted")
+async def get_session_extracted(
+    session_id: str,
+    request: Request,
+    session: dict = Depends(get_owned_session),
+):
+    """Download the extracted markdown."""
+    return _session_file_response(
+        request,
+        session_manager.get_extracted_path(session_id),
+        "text/markdown",
+        f"{session_id}.md",
+    )
 
 
 @app.post("/api/v1/exams/{session_id}/submit")
 async def submit_exam(
     session_id: str,
     request: SubmitExamRequest,
-    current_user: dict = Depends(require_auth),
+    session: dict = Depends(get_owned_session),
 ):
     """Submit user answers and receive correct answers for grading."""
-    verify_session_ownership(session_id, current_user)
-
     answers = session_manager.load_answers(session_id)
     if answers is None:
         raise HTTPException(status_code=404, detail="Answers not generated yet")
@@ -777,46 +1127,49 @@ async def submit_exam(
 @app.get("/api/v1/exams/{session_id}")
 async def get_exam(
     session_id: str,
-    current_user: dict = Depends(require_auth),
+    request: Request,
+    session: dict = Depends(get_owned_session),
 ):
     """Get exam data with answers stripped for client-side display."""
-    verify_session_ownership(session_id, current_user)
-    
-    exam = session_manager.load_exam(session_id)
-    if exam is None:
+    st = _sanitized_exam_stat(session_id)
+    if st is None:
         raise HTTPException(status_code=404, detail="Exam not generated yet")
     
-    sanitized_exam = strip_answers_from_exam(exam)
+    etag = _file_etag(st)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
     
-    return {
-        "session_id": session_id,
-        "result": sanitized_exam,
-        "status": "success",
-    }
+    sanitized_exam = session_manager.load_sanitized_exam_bytes(session_id)
+    # Splice the stored bytes into the envelope instead of decoding and re-encoding
+    body = b"".join((
+        b'{"session_id":', orjson.dumps(session_id),
+        b',"result":', sanitized_exam,
+        b',"status":"success"}',
+    ))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.get("/api/v1/sessions")
-async def list_sessions(
+def list_sessions(
     limit: int = 20,
     current_user: dict = Depends(require_auth),
 ):
     """List recent sessions for the authenticated user."""
-    sessions = session_manager.list_sessions(limit=limit)
-    owned = [s for s in sessions if s.get("user_id") == current_user["id"]]
-    return {
+    # Only the user's own folder is walked; session folders and metadata are
+    # the source of truth (deleted and cleaned-up sessions have no DB cleanup)
+    owned = session_manager.list_sessions(limit=limit, user_id=current_user["id"])
+    return OrjsonResponse({
         "sessions": owned,
         "count": len(owned),
-    }
+    })
 
 
 @app.delete("/api/v1/sessions/{session_id}")
 async def delete_session(
     session_id: str,
-    current_user: dict = Depends(require_auth),
+    session: dict = Depends(get_owned_session),
 ):
     """Delete a session and all its files."""
-    verify_session_ownership(session_id, current_user)
-    
     session_manager.delete(session_id)
     return {
         "session_id": session_id,
@@ -824,16 +1177,20 @@ async def delete_session(
     }
 
 
+# Validation reports per session, tagged with the exam file's (mtime_ns, size)
+VALIDATION_CACHE_MAX_SIZE = 1000
+_validation_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
 @app.get("/api/v1/exams/{session_id}/validate")
 async def validate_exam(
     session_id: str,
-    current_user: dict = Depends(require_auth),
+    session: dict = Depends(get_owned_session),
 ):
     """Validate generated exam against IELTS standards."""
-    verify_session_ownership(session_id, current_user)
-    
-    exam = session_manager.load_exam(session_id)
-    if exam is None:
+    try:
+        st = os.stat(session_manager.get_exam_path(session_id))
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Exam not found")
     
     if exam_validator is None:
@@ -843,7 +1200,20 @@ async def validate_exam(
             "message": "Validator not available",
         }
     
-    is_valid, report = exam_validator.validate_exam(exam)
+    # Reports only change when exam.json is rewritten, so key them on its stat
+    version = (st.st_mtime_ns, st.st_size)
+    entry = _validation_cache.get(session_id)
+    if entry is not None and entry[0] == version:
+        _validation_cache.move_to_end(session_id)
+        is_valid, report = entry[1]
+    else:
+        exam = session_manager.load_exam(session_id)
+        if exam is None:
+            raise HTTPException(status_code=404, detail="Exam not found")
+        is_valid, report = exam_validator.validate_exam(exam)
+        _validation_cache[session_id] = (version, (is_valid, report))
+        if len(_validation_cache) > VALIDATION_CACHE_MAX_SIZE:
+            _validation_cache.popitem(last=False)
     
     return {
         "session_id": session_id,
@@ -853,11 +1223,25 @@ async def validate_exam(
     }
 
 
+def _mark_regenerated_exam(session_id: str, user_id: Optional[str]) -> None:
+    """Flag a regenerated exam as available in the DB (runs in a worker thread)."""
+    db_conn = SessionLocal()
+    try:
+        DBExamSession.update_fields(
+            db_conn, session_id, has_exam=True, has_answers=True, status="completed"
+        )
+    finally:
+        SessionLocal.remove()
+    # has_exam feeds the owner's cached /stats counts
+    if user_id:
+        UserService.invalidate(user_id)
+
+
 @app.post("/api/v1/exams/{session_id}/regenerate")
 async def regenerate_exam(
     session_id: str,
     request: RegenerateRequest,
-    current_user: dict = Depends(require_auth),
+    session: dict = Depends(get_owned_session),
 ):
     """
     Regenerate specific stage of exam.
@@ -867,8 +1251,6 @@ async def regenerate_exam(
     - "questions": Regenerate questions (keeps existing passage)
     - "all": Regenerate everything
     """
-    session = verify_session_ownership(session_id, current_user)
-    
     try:
         # Load existing config or use new values
         existing_config = session.get("exam_config", {}) or {}
@@ -876,9 +1258,8 @@ async def regenerate_exam(
         total_questions = request.total_questions or existing_config.get("total_questions", 14)
         num_question_types = request.num_question_types or existing_config.get("num_question_types")
         
-        # Initialize pipeline
-        llm = LLM.with_system_prompt(system_prompt_file="system_prompt.md")
-        pipeline = IELTSPipeline(llm=llm)
+        # First use reads system_prompt.md; keep that file read off the event loop
+        pipeline = await asyncio.to_thread(get_pipeline)
         
         source_content = session_manager.load_extracted(session_id)
         if not source_content:
@@ -906,30 +1287,21 @@ async def regenerate_exam(
             tasks = pipeline.plan_question_strategy(total_questions, num_question_types)
             question_sections = []
             
-            for task in tasks:
-                questions = pipeline.generate_questions_for_task(passage, task)
+            # Issue all task prompts at once; the LLM semaphore bounds concurrency
+            generated = await pipeline.agenerate_questions(passage, tasks)
+            for task, questions in zip(tasks, generated):
                 question_sections.append({
                     "task_type": task["type_name"],
                     "task_key": task["type_key"],
                     **questions
                 })
-                session_manager.save_questions(session_id, len(question_sections), questions)
+            session_manager.save_questions_bulk(session_id, generated)
             
             answers = pipeline.extract_answers(question_sections)
             session_manager.save_answers(session_id, answers)
             
             # Strip answers from tasks before returning to client
-            sanitized_tasks = []
-            for section in question_sections:
-                sanitized = copy.deepcopy(section)
-                for q in sanitized.get("questions", []):
-                    q.pop("correct_answer", None)
-                    q.pop("answer", None)
-                    q.pop("explanation", None)
-                    q.pop("correct_heading_id", None)
-                    q.pop("correct_paragraph", None)
-                    q.pop("correct_feature_id", None)
-                sanitized_tasks.append(sanitized)
+            sanitized_tasks = [strip_answers_from_task(section) for section in question_sections]
             
             return {
                 "session_id": session_id,
@@ -947,30 +1319,13 @@ async def regenerate_exam(
                 num_question_types=num_question_types,
             )
             
-            if "reading_passage" in result:
-                session_manager.save_passage(session_id, result["reading_passage"])
-            if "tasks" in result:
-                for i, task in enumerate(result["tasks"]):
-                    session_manager.save_questions(session_id, i + 1, task)
-            if "answers" in result:
-                session_manager.save_answers(session_id, result["answers"])
-            
-            session_manager.save_exam(session_id, result)
-            
-            # Update database
-            from database import SessionLocal, ExamSession as DBExamSession
-            db_conn = SessionLocal()
-            try:
-                db_session = db_conn.query(DBExamSession).filter(DBExamSession.id == session_id).first()
-                if db_session:
-                    db_session.has_exam = True
-                    db_session.has_answers = True
-                    db_session.status = "completed"
-                    db_conn.commit()
-            finally:
-                db_conn.close()
-            
             sanitized_result = strip_answers_from_exam(result)
+            await asyncio.to_thread(
+                session_manager.save_exam_artifacts, session_id, result, sanitized_result
+            )
+            
+            # Update database (blocking query, keep it off the event loop)
+            await asyncio.to_thread(_mark_regenerated_exam, session_id, session.get("user_id"))
             
             return {
                 "session_id": session_id,
@@ -982,8 +1337,7 @@ async def regenerate_exam(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error regenerating: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error regenerating: %s", e)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
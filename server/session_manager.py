@@ -3,15 +3,118 @@ Session Manager for AcaRead API.
 Handles session creation, storage, and lifecycle management.
 """
 import os
-import json
+import orjson
 import shutil
+import threading
+import time
+import atexit
+import base64
 import secrets
-import string
+import heapq
+import hashlib
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple, List, BinaryIO
 from pathlib import Path
 
 
+# Session files stay human-readable (indented); int keys (e.g. answer numbers)
+# are written as strings, as the stdlib encoder did
+_DUMPS_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize session data to UTF-8 JSON bytes."""
+    return orjson.dumps(obj, option=_DUMPS_OPTIONS)
+
+
+_loads = orjson.loads
+
+
+@dataclass(frozen=True, slots=True)
+class SessionPaths:
+    """File layout of one session folder."""
+    root: str
+    source: str
+    extracted: str
+    passage: str
+    questions: str
+    exam: str
+    sanitized_exam: str
+    answers: str
+    metadata: str
+    stage_log: str
+
+
+@lru_cache(maxsize=4096)
+def _session_paths(root: str) -> SessionPaths:
+    """Join a session folder's file paths (memoized; the layout never changes)."""
+    return SessionPaths(
+        root=root,
+        source=os.path.join(root, "source.pdf"),
+        extracted=os.path.join(root, "extracted.md"),
+        passage=os.path.join(root, "passage.json"),
+        questions=os.path.join(root, "questions"),
+        exam=os.path.join(root, "exam.json"),
+        sanitized_exam=os.path.join(root, "exam_sanitized.json"),
+        answers=os.path.join(root, "answers.json"),
+        metadata=os.path.join(root, "metadata.json"),
+        stage_log=os.path.join(root, SessionManager.STAGE_LOG_FILE),
+    )
+
+
+def _digest(data: bytes) -> bytes:
+    """Short content hash used to skip rewriting identical metadata."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+# (epoch second, ISO string) of the last timestamp handed out
+_ts_cache: Tuple[int, str] = (0, "")
+
+
+def _now_iso() -> str:
+    """Local time as an ISO string at second resolution, rebuilt once per second."""
+    global _ts_cache
+    second = int(time.time())
+    cached_second, iso = _ts_cache
+    if second != cached_second:
+        iso = datetime.fromtimestamp(second).isoformat()
+        _ts_cache = (second, iso)
+    return iso
+
+
+# Shared by flush_batch (a batch of O_DSYNC writes waits on the disk together)
+# and load_all_questions (legacy per-task files are read concurrently)
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="session-io")
+
+# Plain in-place writes, and temp files for atomic writes;
+# O_DSYNC/O_BINARY only exist on some platforms
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+_ATOMIC_WRITE_FLAGS = (
+    os.O_WRONLY | os.O_CREAT | os.O_EXCL
+    | getattr(os, "O_DSYNC", 0) | getattr(os, "O_BINARY", 0)
+)
+_APPEND_FLAGS = (
+    os.O_WRONLY | os.O_CREAT | os.O_APPEND
+    | getattr(os, "O_DSYNC", 0) | getattr(os, "O_BINARY", 0)
+)
+
+
+def _read_json(path: str) -> Any:
+    """Read and parse one JSON file."""
+    with open(path, "rb") as f:
+        return _loads(f.read())
+
+
+def _write_fd(fd: int, data: bytes) -> None:
+    """os.write until every byte is written (a single call for small payloads)."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
 class SessionManager:
     """
     Manages exam generation sessions with organized folder structure.
@@ -19,17 +122,25 @@ class SessionManager:
     Session Structure:
     sessions/
     └── {session_id}/
-        ├── metadata.json       # Session info
+        ├── metadata.json       # Session info (snapshot)
+        ├── metadata.log        # Stage transitions since the snapshot (JSON lines)
         ├── source.pdf          # Original PDF
         ├── extracted.md        # Extracted markdown
         ├── passage.json        # Generated passage
-        ├── questions/          # Question files by type
-        │   ├── task_1.json
-        │   └── task_2.json
-        └── exam.json           # Final combined exam
+        ├── questions/          # Question files
+        │   └── tasks.json      # All tasks, written in one pass
+        │                       # (older sessions: task_1.json, task_2.json, ...)
+        ├── exam.json           # Final combined exam
+        └── exam_sanitized.json # Exam as served to clients (answers stripped)
     """
     
     SESSION_ID_LENGTH = 8
+    QUESTIONS_BULK_FILE = "tasks.json"
+    INDEX_FILE = "_index.json"  # session_id -> user folder, so lookups skip the directory scan
+    METADATA_FLUSH_INTERVAL = 0.05  # seconds metadata writes are held back to coalesce
+    METADATA_CACHE_MAX_SIZE = 1024  # parsed metadata entries kept in memory
+    STAGE_LOG_FILE = "metadata.log"
+    STAGE_LOG_COMPACT_LINES = 16  # appended stage events before a full snapshot is forced
     
     def __init__(self, base_dir: str = None):
         """Initialize SessionManager with base directory."""
@@ -39,26 +150,87 @@ class SessionManager:
         self.base_dir = base_dir
         os.makedirs(self.base_dir, exist_ok=True)
         
-        # In-memory cache for active sessions
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        # Map session_id -> user_id for path resolution
-        self._session_user_map: Dict[str, str] = {}
+        # Parsed metadata keyed by session_id, tagged with the snapshot's (mtime_ns, size)
+        # and the stage log's size so edits made by other worker processes are picked
+        # up, and a digest of the snapshot bytes so unchanged metadata is not
+        # rewritten; LRU-bounded
+        self._cache: "OrderedDict[str, Tuple[Tuple[int, int, int], Dict[str, Any], bytes]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Stage events appended by this process since the last snapshot
+        self._stage_log_lines: Dict[str, int] = {}
+        # Map session_id -> user folder for path resolution, persisted in INDEX_FILE
+        self._index_path = os.path.join(self.base_dir, self.INDEX_FILE)
+        self._index_lock = threading.Lock()
+        self._session_user_map: Dict[str, str] = self._load_index()
+        
+        # Per-session locks: update()/update_stage() mutate the shared cached dict
+        self._session_locks: Dict[str, threading.Lock] = {}
+        self._session_locks_guard = threading.Lock()
+        
+        # Write-back buffer: metadata updated in memory, persisted by a flusher thread
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._dirty_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _load_index(self) -> Dict[str, str]:
+        """Load the session index, rebuilding it from the folders if missing or stale."""
+        try:
+            with open(self._index_path, "rb") as f:
+                index = _loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            index = None
+        
+        if index is not None:
+            # Drop sessions removed behind our back (e.g. by SessionCleaner)
+            live = {
+                sid: folder for sid, folder in index.items()
+                if os.path.isdir(os.path.join(self.base_dir, folder, sid))
+            }
+            if len(live) != len(index):
+                self._write_index(live)
+            return live
+        
+        index = {}
+        for user_folder in os.listdir(self.base_dir):
+            user_path = os.path.join(self.base_dir, user_folder)
+            if not os.path.isdir(user_path):
+                continue
+            for sid in os.listdir(user_path):
+                if os.path.isdir(os.path.join(user_path, sid, "questions")):
+                    index[sid] = user_folder
+        self._write_index(index)
+        return index
+
+    def _write_index(self, index: Dict[str, str]) -> None:
+        """Persist the session index (small; rewritten whole)."""
+        with self._index_lock:
+            self._write_atomic(self._index_path, orjson.dumps(index))
 
     def _generate_session_id(self) -> str:
-        """Generate a short, URL-safe session ID."""
-        alphabet = string.ascii_lowercase + string.digits
+        """Generate a short, URL-safe session ID (lowercase base32 of one random draw)."""
+        n_bytes = (self.SESSION_ID_LENGTH * 5 + 7) // 8
         while True:
-            session_id = ''.join(secrets.choice(alphabet) for _ in range(self.SESSION_ID_LENGTH))
-            # Check if not exists in any user folder
-            if not self._find_session_path(session_id):
+            raw = base64.b32encode(secrets.token_bytes(n_bytes)).decode("ascii")
+            session_id = raw.lower()[:self.SESSION_ID_LENGTH]
+            # The index knows every session, so uniqueness needs no filesystem scan
+            if session_id not in self._session_user_map:
                 return session_id
 
-    def _find_session_path(self, session_id: str) -> Optional[str]:
-        """Find session path across all user folders."""
-        # Check cache first
-        if session_id in self._session_user_map:
-            user_id = self._session_user_map[session_id]
-            return os.path.join(self.base_dir, user_id, session_id)
+    def _find_session_path(self, session_id: str, validate: bool = False) -> Optional[str]:
+        """
+        Find session path across all user folders.
+        
+        Indexed sessions resolve with a dict lookup and no filesystem access;
+        validate=True also confirms the folder still exists. Unknown IDs (e.g.
+        created by another worker process) fall back to scanning user folders.
+        """
+        user_id = self._session_user_map.get(session_id)
+        if user_id is not None:
+            session_path = os.path.join(self.base_dir, user_id, session_id)
+            if not validate or os.path.isdir(session_path):
+                return session_path
+            self._forget_session(session_id)
         
         # Search in all user folders
         if os.path.exists(self.base_dir):
@@ -68,6 +240,7 @@ class SessionManager:
                     session_path = os.path.join(user_path, session_id)
                     if os.path.isdir(session_path):
                         self._session_user_map[session_id] = user_folder
+                        self._write_index(dict(self._session_user_map))
                         return session_path
         
         # Legacy: check flat structure (backward compatibility)
@@ -91,14 +264,9 @@ class SessionManager:
         # Guest sessions go to "guest" folder
         return os.path.join(self.base_dir, "guest", session_id)
 
-    def _get_metadata_path(self, session_id: str) -> str:
-        """Get the metadata file path for a session."""
-        session_dir = self._find_session_path(session_id) or self._get_session_dir(session_id)
-        return os.path.join(session_dir, "metadata.json")
-
     def exists(self, session_id: str) -> bool:
         """Check if a session exists."""
-        return self._find_session_path(session_id) is not None
+        return self._find_session_path(session_id, validate=True) is not None
 
     def create(self, filename: str, source_type: str = "file", user_id: str = None) -> str:
         """
@@ -124,13 +292,15 @@ class SessionManager:
         
         # Cache the mapping
         self._session_user_map[session_id] = folder_id
+        self._write_index(dict(self._session_user_map))
         
         # Initialize metadata
+        now = _now_iso()
         metadata = {
             "session_id": session_id,
             "user_id": user_id,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
+            "created_at": now,
+            "updated_at": now,
             "filename": filename,
             "source_type": source_type,
             "status": "created",
@@ -146,101 +316,318 @@ class SessionManager:
         }
         
         self._save_metadata(session_id, metadata)
-        self._cache[session_id] = metadata
+        # Written through so other worker processes can see the new session at once
+        self.flush()
         
         return session_id
 
+    @staticmethod
+    def _file_size(path: str) -> int:
+        """Size of a file, 0 if it does not exist."""
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _stat_key(self, paths: SessionPaths) -> Tuple[int, int, int]:
+        """Cache validator for a session's metadata (raises if the snapshot is missing)."""
+        st = os.stat(paths.metadata)
+        return st.st_mtime_ns, st.st_size, self._file_size(paths.stage_log)
+
+    @staticmethod
+    def _replay_stage_log(metadata: Dict[str, Any], log_path: str) -> Dict[str, Any]:
+        """Apply stage events newer than the snapshot (by sequence number) to metadata."""
+        try:
+            with open(log_path, "rb") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return metadata
+        
+        seq = metadata.get("stage_seq", 0)
+        for line in lines:
+            try:
+                event = _loads(line)
+            except orjson.JSONDecodeError:
+                continue  # torn last line after a crash
+            if event["seq"] <= seq:
+                continue  # already in the snapshot
+            metadata["stages"][event["stage"]] = {
+                "status": event["status"],
+                "completed_at": event["ts"],
+            }
+            metadata["status"] = event["stage"]
+            metadata["updated_at"] = event["ts"]
+            seq = event["seq"]
+        metadata["stage_seq"] = seq
+        return metadata
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        """Per-session lock serializing read-modify-write of metadata."""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            with self._session_locks_guard:
+                lock = self._session_locks.setdefault(session_id, threading.Lock())
+        return lock
+
     def _save_metadata(self, session_id: str, metadata: Dict[str, Any]) -> None:
-        """Save metadata to file."""
-        metadata["updated_at"] = datetime.now().isoformat()
-        with open(self._get_metadata_path(session_id), "w", encoding="utf-8") as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        """
+        Save metadata (write-back).
+        
+        The update is visible to this process immediately; the file is written
+        by the flusher thread within METADATA_FLUSH_INTERVAL, so a burst of
+        stage/progress updates costs one write.
+        """
+        metadata["updated_at"] = _now_iso()
+        with self._dirty_lock:
+            self._dirty[session_id] = metadata
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="session-metadata-flusher", daemon=True
+                )
+                self._flusher.start()
+                atexit.register(self.flush)
+        self._flush_event.set()
+
+    def _flush_loop(self) -> None:
+        """Flusher thread: wait for dirty metadata, let updates coalesce, write."""
+        while True:
+            self._flush_event.wait()
+            time.sleep(self.METADATA_FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all pending metadata to disk (also called at shutdown)."""
+        with self._dirty_lock:
+            pending, self._dirty = self._dirty, {}
+        for session_id, metadata in pending.items():
+            paths = self.paths(session_id)
+            # Serialize under the session lock so a concurrent update is never half-seen
+            with self._session_lock(session_id):
+                data = _dumps(metadata)
+                log_size = self._file_size(paths.stage_log)
+            digest = _digest(data)
+            try:
+                cached = self._cache.get(session_id)
+                if cached and cached[2] == digest and cached[0] == self._stat_key(paths):
+                    continue  # file already holds exactly these bytes
+                self._write_atomic(paths.metadata, data)
+                if log_size:
+                    self._compact_stage_log(session_id, paths, log_size)
+                key = self._stat_key(paths)
+            except FileNotFoundError:
+                continue  # session deleted before the write landed
+            self._cache_put(session_id, (key, metadata, digest))
+
+    def _compact_stage_log(self, session_id: str, paths: SessionPaths, log_size: int) -> None:
+        """Truncate the stage log once a snapshot covering all of it is on disk."""
+        with self._session_lock(session_id):
+            # Events appended after the snapshot was serialized must survive
+            if self._file_size(paths.stage_log) == log_size:
+                os.truncate(paths.stage_log, 0)
+                self._stage_log_lines.pop(session_id, None)
+
+    def _append_stage_event(self, session_id: str, metadata: Dict[str, Any], event: Dict[str, Any]) -> bool:
+        """
+        Append one stage event to the session's stage log (caller holds the session lock).
+        
+        Returns:
+            False when the log is due for compaction and a full snapshot should be saved
+        """
+        lines = self._stage_log_lines.get(session_id, 0)
+        if lines >= self.STAGE_LOG_COMPACT_LINES:
+            return False
+        
+        paths = self.paths(session_id)
+        fd = os.open(paths.stage_log, _APPEND_FLAGS, 0o644)
+        try:
+            _write_fd(fd, orjson.dumps(event) + b"\n")
+        finally:
+            os.close(fd)
+        self._stage_log_lines[session_id] = lines + 1
+        
+        # The cached dict already holds the event; re-tag it with the new log size
+        with self._cache_lock:
+            cached = self._cache.get(session_id)
+            if cached and cached[1] is metadata:
+                self._cache[session_id] = (self._stat_key(paths), metadata, cached[2])
+        return True
+
+    def _cache_put(self, session_id: str, entry: Tuple[Tuple[int, int, int], Dict[str, Any], bytes]) -> None:
+        """Insert into the metadata LRU, evicting the least recently used entry."""
+        with self._cache_lock:
+            self._cache[session_id] = entry
+            self._cache.move_to_end(session_id)
+            if len(self._cache) > self.METADATA_CACHE_MAX_SIZE:
+                self._cache.popitem(last=False)
 
     def _load_metadata(self, session_id: str) -> Dict[str, Any]:
-        """Load metadata from file."""
-        metadata_path = self._get_metadata_path(session_id)
-        if os.path.exists(metadata_path):
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return None
+        """
+        Load metadata, preferring not-yet-flushed updates.
+        
+        A stat is enough to tell whether the cached copy is current; the files
+        are only re-read and parsed when the snapshot or the stage log changed.
+        """
+        pending = self._dirty.get(session_id)
+        if pending is not None:
+            return pending
+        
+        paths = self.paths(session_id)
+        try:
+            key = self._stat_key(paths)
+        except FileNotFoundError:
+            with self._cache_lock:
+                self._cache.pop(session_id, None)
+            return None
+        
+        with self._cache_lock:
+            cached = self._cache.get(session_id)
+            if cached and cached[0] == key:
+                self._cache.move_to_end(session_id)
+                return cached[1]
+        
+        with open(paths.metadata, "rb") as f:
+            data = f.read()
+        metadata = _loads(data)
+        if key[2]:
+            metadata = self._replay_stage_log(metadata, paths.stage_log)
+        self._cache_put(session_id, (key, metadata, _digest(data)))
+        return metadata
 
     def get(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session metadata."""
-        if session_id in self._cache:
-            return self._cache[session_id]
-        
-        if self.exists(session_id):
-            metadata = self._load_metadata(session_id)
-            if metadata:
-                self._cache[session_id] = metadata
-                return metadata
-        
-        return None
+        # _load_metadata notices a missing file, so skip the existence check
+        if self._find_session_path(session_id) is None:
+            return None
+        return self._load_metadata(session_id) or None
 
     def update(self, session_id: str, **kwargs) -> None:
         """Update session metadata."""
-        metadata = self.get(session_id)
-        if metadata is None:
-            raise ValueError(f"Session not found: {session_id}")
-        
-        metadata.update(kwargs)
-        self._save_metadata(session_id, metadata)
-        self._cache[session_id] = metadata
+        with self._session_lock(session_id):
+            metadata = self.get(session_id)
+            if metadata is None:
+                raise ValueError(f"Session not found: {session_id}")
+            
+            metadata.update(kwargs)
+            self._save_metadata(session_id, metadata)
 
     def update_stage(self, session_id: str, stage: str, status: str = "completed") -> None:
-        """Update a specific stage status."""
-        metadata = self.get(session_id)
-        if metadata is None:
-            raise ValueError(f"Session not found: {session_id}")
-        
-        metadata["stages"][stage] = {
-            "status": status,
-            "completed_at": datetime.now().isoformat(),
-        }
-        metadata["status"] = stage
-        self._save_metadata(session_id, metadata)
-        self._cache[session_id] = metadata
+        """
+        Update a specific stage status.
+        
+        The transition is appended to the stage log (a ~80 byte write) instead
+        of rewriting metadata.json, unless a snapshot is already pending.
+        """
+        with self._session_lock(session_id):
+            metadata = self.get(session_id)
+            if metadata is None:
+                raise ValueError(f"Session not found: {session_id}")
+            
+            now = _now_iso()
+            seq = metadata.get("stage_seq", 0) + 1
+            metadata["stages"][stage] = {
+                "status": status,
+                "completed_at": now,
+            }
+            metadata["status"] = stage
+            metadata["stage_seq"] = seq
+            
+            event = {"seq": seq, "ts": now, "stage": stage, "status": status}
+            if session_id in self._dirty or not self._append_stage_event(session_id, metadata, event):
+                self._save_metadata(session_id, metadata)
+            else:
+                metadata["updated_at"] = now
 
     # =========================================================================
     # FILE OPERATIONS
     # =========================================================================
+    def paths(self, session_id: str) -> SessionPaths:
+        """Get all file paths of a session (joined once per session folder)."""
+        return _session_paths(self._get_session_dir(session_id))
+
     def get_source_path(self, session_id: str) -> str:
         """Get path for the source PDF file."""
-        return os.path.join(self._get_session_dir(session_id), "source.pdf")
+        return self.paths(session_id).source
 
     def get_extracted_path(self, session_id: str) -> str:
         """Get path for the extracted markdown file."""
-        return os.path.join(self._get_session_dir(session_id), "extracted.md")
+        return self.paths(session_id).extracted
 
     def get_passage_path(self, session_id: str) -> str:
         """Get path for the generated passage file."""
-        return os.path.join(self._get_session_dir(session_id), "passage.json")
+        return self.paths(session_id).passage
 
     def get_questions_dir(self, session_id: str) -> str:
         """Get path for the questions directory."""
-        return os.path.join(self._get_session_dir(session_id), "questions")
+        return self.paths(session_id).questions
 
     def get_exam_path(self, session_id: str) -> str:
         """Get path for the final exam file."""
-        return os.path.join(self._get_session_dir(session_id), "exam.json")
+        return self.paths(session_id).exam
+
+    def get_sanitized_exam_path(self, session_id: str) -> str:
+        """Get path for the client-facing (answers stripped) exam file."""
+        return self.paths(session_id).sanitized_exam
 
     def get_answers_path(self, session_id: str) -> str:
         """Get path for the answer key file."""
-        return os.path.join(self._get_session_dir(session_id), "answers.json")
+        return self.paths(session_id).answers
+
+    @staticmethod
+    def _write_all(path: str, data: bytes) -> None:
+        """Write bytes in place with raw os.write calls (no text or buffer layer)."""
+        fd = os.open(path, _WRITE_FLAGS, 0o644)
+        try:
+            _write_fd(fd, data)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        """
+        Write bytes via a temp file + rename so readers never see a partial file.
+        
+        The temp file is opened O_DSYNC, so the data is on disk when the last
+        write returns and no separate fsync is needed before the rename.
+        """
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, _ATOMIC_WRITE_FLAGS, 0o644)
+        try:
+            try:
+                _write_fd(fd, data)
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def flush_batch(self, files: List[Tuple[str, bytes]]) -> None:
+        """
+        Write several files concurrently, each atomically, and wait for all.
+        
+        Args:
+            files: (path, data) pairs
+        """
+        if len(files) == 1:
+            self._write_atomic(*files[0])
+            return
+        futures = [_IO_POOL.submit(self._write_atomic, path, data) for path, data in files]
+        for future in futures:
+            future.result()
 
     def save_source(self, session_id: str, content: bytes) -> str:
         """Save source PDF file."""
         path = self.get_source_path(session_id)
-        with open(path, "wb") as f:
-            f.write(content)
+        self._write_all(path, content)
         self.update_stage(session_id, "upload")
         return path
 
     def save_extracted(self, session_id: str, content: str, word_count: int = None) -> str:
         """Save extracted markdown content."""
         path = self.get_extracted_path(session_id)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+        self._write_all(path, content.encode("utf-8"))
         
         if word_count:
             self.update(session_id, word_count=word_count)
@@ -256,11 +643,17 @@ class SessionManager:
                 return f.read()
         return None
 
+    def open_extracted(self, session_id: str) -> Optional[BinaryIO]:
+        """Open extracted markdown as an unbuffered binary stream (caller closes it)."""
+        try:
+            return open(self.get_extracted_path(session_id), "rb", buffering=0)
+        except FileNotFoundError:
+            return None
+
     def save_passage(self, session_id: str, passage: Dict[str, Any]) -> str:
         """Save generated passage."""
         path = self.get_passage_path(session_id)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(passage, f, ensure_ascii=False, indent=2)
+        self._write_atomic(path, _dumps(passage))
         self.update_stage(session_id, "passage")
         return path
 
@@ -268,15 +661,35 @@ class SessionManager:
         """Load generated passage."""
         path = self.get_passage_path(session_id)
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(path, "rb") as f:
+                return _loads(f.read())
         return None
 
     def save_questions(self, session_id: str, task_index: int, questions: Dict[str, Any]) -> str:
         """Save questions for a specific task."""
         path = os.path.join(self.get_questions_dir(session_id), f"task_{task_index}.json")
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(questions, f, ensure_ascii=False, indent=2)
+        self._write_atomic(path, _dumps(questions))
+        return path
+
+    def save_questions_bulk(self, session_id: str, tasks: list) -> str:
+        """
+        Save questions for all tasks into a single file.
+        
+        The payload is serialized once and written to a temp file that is
+        renamed into place, so readers never see a partially written set.
+        
+        Args:
+            session_id: Session ID
+            tasks: Question dicts in task order
+            
+        Returns:
+            Path of the combined questions file
+        """
+        questions_dir = self.get_questions_dir(session_id)
+        os.makedirs(questions_dir, exist_ok=True)
+        path = os.path.join(questions_dir, self.QUESTIONS_BULK_FILE)
+        
+        self._write_atomic(path, _dumps({"tasks": tasks}))
         return path
 
     def load_all_questions(self, session_id: str) -> list:
@@ -284,19 +697,31 @@ class SessionManager:
         questions_dir = self.get_questions_dir(session_id)
         questions = []
         
+        bulk_path = os.path.join(questions_dir, self.QUESTIONS_BULK_FILE)
+        if os.path.exists(bulk_path):
+            with open(bulk_path, "rb") as f:
+                return _loads(f.read())["tasks"]
+        
+        # Legacy: one file per task
         if os.path.exists(questions_dir):
-            for filename in sorted(os.listdir(questions_dir)):
-                if filename.endswith(".json"):
-                    with open(os.path.join(questions_dir, filename), "r", encoding="utf-8") as f:
-                        questions.append(json.load(f))
+            paths = [
+                os.path.join(questions_dir, filename)
+                for filename in sorted(os.listdir(questions_dir))
+                if filename.endswith(".json")
+            ]
+            # Overlap the reads; map() keeps the sorted order
+            questions = list(_IO_POOL.map(_read_json, paths))
         
         return questions
 
     def save_exam(self, session_id: str, exam: Dict[str, Any]) -> str:
         """Save final combined exam."""
         path = self.get_exam_path(session_id)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(exam, f, ensure_ascii=False, indent=2)
+        self._write_atomic(path, _dumps(exam))
+        # The sanitized copy was derived from the previous exam
+        sanitized_path = self.get_sanitized_exam_path(session_id)
+        if os.path.exists(sanitized_path):
+            os.remove(sanitized_path)
         self.update_stage(session_id, "exam")
         return path
 
@@ -304,8 +729,65 @@ class SessionManager:
         """Load final exam."""
         path = self.get_exam_path(session_id)
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(path, "rb") as f:
+                return _loads(f.read())
+        return None
+
+    def save_exam_artifacts(
+        self,
+        session_id: str,
+        exam: Dict[str, Any],
+        sanitized_exam: Dict[str, Any],
+    ) -> str:
+        """
+        Save everything a finished exam produces in one batch.
+        
+        Passage, questions, answer key, the full exam and its client-facing
+        copy are serialized up front and written together via flush_batch,
+        instead of one blocking write after another.
+        
+        Args:
+            session_id: Session ID
+            exam: Full pipeline result (with answers)
+            sanitized_exam: Exam with answers stripped, as served to clients
+            
+        Returns:
+            Path of the exam file
+        """
+        exam_path = self.get_exam_path(session_id)
+        files = []
+        if "reading_passage" in exam:
+            files.append((self.get_passage_path(session_id), _dumps(exam["reading_passage"])))
+        if "tasks" in exam:
+            questions_dir = self.get_questions_dir(session_id)
+            os.makedirs(questions_dir, exist_ok=True)
+            files.append((os.path.join(questions_dir, self.QUESTIONS_BULK_FILE), _dumps({"tasks": exam["tasks"]})))
+        if "answers" in exam:
+            files.append((self.get_answers_path(session_id), _dumps(exam["answers"])))
+        files.append((exam_path, _dumps(exam)))
+        files.append((
+            self.get_sanitized_exam_path(session_id),
+            orjson.dumps(sanitized_exam, option=orjson.OPT_NON_STR_KEYS),
+        ))
+        self.flush_batch(files)
+        
+        if "reading_passage" in exam:
+            self.update_stage(session_id, "passage")
+        self.update_stage(session_id, "exam")
+        return exam_path
+
+    def save_sanitized_exam(self, session_id: str, exam: Dict[str, Any]) -> str:
+        """Save the client-facing exam, serialized once so it can be served as-is."""
+        path = self.get_sanitized_exam_path(session_id)
+        self._write_atomic(path, orjson.dumps(exam, option=orjson.OPT_NON_STR_KEYS))
+        return path
+
+    def load_sanitized_exam_bytes(self, session_id: str) -> Optional[bytes]:
+        """Load the client-facing exam as raw JSON bytes."""
+        path = self.get_sanitized_exam_path(session_id)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
         return None
 
     def has_exam(self, session_id: str) -> bool:
@@ -315,16 +797,15 @@ class SessionManager:
     def save_answers(self, session_id: str, answers: Dict[str, Any]) -> str:
         """Save answer key separately."""
         path = self.get_answers_path(session_id)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(answers, f, ensure_ascii=False, indent=2)
+        self._write_atomic(path, _dumps(answers))
         return path
 
     def load_answers(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Load answer key."""
         path = self.get_answers_path(session_id)
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(path, "rb") as f:
+                return _loads(f.read())
         return None
 
     def has_answers(self, session_id: str) -> bool:
@@ -337,32 +818,69 @@ class SessionManager:
     def delete(self, session_id: str) -> bool:
         """Delete a session."""
         session_dir = self._get_session_dir(session_id)
+        with self._dirty_lock:
+            self._dirty.pop(session_id, None)
         if os.path.exists(session_dir):
             shutil.rmtree(session_dir)
-            if session_id in self._cache:
-                del self._cache[session_id]
+            self._forget_session(session_id)
             return True
         return False
 
-    def list_sessions(self, limit: int = 50) -> list:
-        """List recent sessions."""
-        sessions = []
+    def _forget_session(self, session_id: str) -> None:
+        """Drop a removed session from the caches and the index."""
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+        self._session_locks.pop(session_id, None)
+        self._stage_log_lines.pop(session_id, None)
+        if self._session_user_map.pop(session_id, None) is not None:
+            self._write_index(dict(self._session_user_map))
+
+    def list_sessions(self, limit: int = 50, user_id: str = None) -> list:
+        """
+        List recent sessions, optionally for one user folder.
         
-        if os.path.exists(self.base_dir):
-            for session_id in os.listdir(self.base_dir):
-                metadata = self._load_metadata(session_id)
-                if metadata:
-                    sessions.append({
-                        "session_id": session_id,
-                        "created_at": metadata.get("created_at"),
-                        "filename": metadata.get("filename"),
-                        "status": metadata.get("status"),
-                        "has_exam": self.has_exam(session_id),
-                    })
+        Walks base_dir/{user}/{session}/ with scandir and keeps the `limit`
+        most recently modified session folders (a bounded heap), so metadata
+        is only parsed for sessions that are returned.
+        """
+        candidates = []
+        try:
+            user_entries = [
+                e for e in os.scandir(self.base_dir)
+                if e.is_dir() and (user_id is None or e.name == user_id)
+            ]
+        except FileNotFoundError:
+            return []
+        
+        for user_entry in user_entries:
+            with os.scandir(user_entry.path) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        candidates.append((entry.stat().st_mtime, user_entry.name, entry.name, entry.path))
+        
+        sessions = []
+        for _, folder, session_id, session_dir in heapq.nlargest(limit, candidates):
+            metadata = self._dirty.get(session_id)
+            if metadata is None:
+                try:
+                    metadata = self._replay_stage_log(
+                        _read_json(os.path.join(session_dir, "metadata.json")),
+                        os.path.join(session_dir, self.STAGE_LOG_FILE),
+                    )
+                except (FileNotFoundError, orjson.JSONDecodeError):
+                    continue
+            sessions.append({
+                "session_id": session_id,
+                "user_id": metadata.get("user_id"),
+                "created_at": metadata.get("created_at"),
+                "filename": metadata.get("filename"),
+                "status": metadata.get("status"),
+                "has_exam": os.path.exists(os.path.join(session_dir, "exam.json")),
+            })
         
         # Sort by creation time (newest first)
-        sessions.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        return sessions[:limit]
+        sessions.sort(key=lambda x: x.get("created_at") or "", reverse=True)
+        return sessions
 
 
 # Global session manager instance
@@ -0,0 +1,6 @@
+"""Shared test setup: server modules are imported as top-level modules."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET", "test-secret")
@@ -0,0 +1,20 @@
+"""SessionCleaner must see files that change deep inside a session."""
+from utils.cleanup import SessionCleaner
+
+
+def test_total_storage_tracks_growing_session(tmp_path):
+    session_dir = tmp_path / "u1" / "s1"
+    (session_dir / "questions").mkdir(parents=True)
+    (session_dir / "metadata.json").write_bytes(b"{}")
+
+    cleaner = SessionCleaner(sessions_dir=str(tmp_path), max_storage_mb=1)
+    assert cleaner.get_total_storage()["total_bytes"] == 2
+
+    # Neither write adds or removes entries in the top-level folder
+    (session_dir / "questions" / "tasks.json").write_bytes(b"x" * 5_000_000)
+    with open(session_dir / "metadata.json", "ab") as f:
+        f.write(b"\n" * 1000)
+
+    assert cleaner.get_total_storage()["total_bytes"] == 5_001_002
+    assert cleaner.cleanup_storage_limit() == 1
+    assert not (tmp_path / "u1").exists()
@@ -0,0 +1,22 @@
+"""Model to_dict() output stays plain-json serializable."""
+import json
+from datetime import datetime
+
+from database import ExamResult, ExamSession, User
+
+WHEN = datetime(2026, 1, 2, 3, 4, 5)
+
+
+def test_to_dict_renders_datetimes_as_iso_strings():
+    user = User(id="u1", email="a@b.c", created_at=WHEN, credits_week_start=WHEN)
+    session = ExamSession(id="s1", user_id="u1", created_at=WHEN)
+    result = ExamResult(id="r1", user_id="u1", session_id="s1", started_at=WHEN)
+
+    user_dict = user.to_dict()
+    assert user_dict["created_at"] == WHEN.isoformat()
+    assert user_dict["credits"]["week_start"] == WHEN.isoformat()
+    assert user_dict["last_login_at"] is None
+    assert session.to_dict()["created_at"] == WHEN.isoformat()
+    assert result.to_dict()["started_at"] == WHEN.isoformat()
+    for obj in (user, session, result):
+        json.dumps(obj.to_dict())
@@ -0,0 +1,67 @@
+"""Regenerate must reach the model every time, never the response cache."""
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import llm as llm_module
+import server
+from ielts_pipeline import IELTSPipeline
+from llm import LLM
+
+SESSION_ID = "s1"
+PASSAGE = {"title": "T", "content": "word " * 800, "topic": "science"}
+
+
+class FakeModel:
+    """Stands in for GoogleGenerativeAI and counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.replies = []  # queued raw replies, served before the default passage
+
+    def invoke(self, prompt, stop=None, **kwargs):
+        self.calls += 1
+        if self.replies:
+            return self.replies.pop(0)
+        return orjson.dumps(PASSAGE).decode()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    llm = LLM(api_key="test", system_prompt="system")
+    llm._llm = fake
+    pipeline = IELTSPipeline(llm=llm)
+
+    monkeypatch.setattr(llm_module, "_response_cache", llm_module.OrderedDict())
+    monkeypatch.setattr(server, "get_pipeline", lambda: pipeline)
+    monkeypatch.setattr(server.session_manager, "load_extracted", lambda sid: "Source text. " * 50)
+    monkeypatch.setattr(server.session_manager, "save_passage", lambda sid, passage: None)
+    server.app.dependency_overrides[server.get_owned_session] = lambda: {
+        "session_id": SESSION_ID,
+        "exam_config": {"passage_type": 1},
+    }
+    yield fake
+    server.app.dependency_overrides.clear()
+
+
+def test_regenerate_passage_calls_model_each_time(model):
+    client = TestClient(server.app)
+    for _ in range(2):
+        response = client.post(
+            f"/api/v1/exams/{SESSION_ID}/regenerate", json={"stage": "passage"}
+        )
+        assert response.status_code == 200, response.text
+    assert model.calls == 2
+
+
+def test_regenerate_repair_attempts_are_not_cached(model):
+    model.replies = ["", orjson.dumps(PASSAGE).decode(), ""]
+    client = TestClient(server.app)
+    for _ in range(2):
+        response = client.post(
+            f"/api/v1/exams/{SESSION_ID}/regenerate", json={"stage": "passage"}
+        )
+        assert response.status_code == 200, response.text
+    # Each regenerate: a failed first attempt, then a fresh repair attempt
+    assert model.calls == 4
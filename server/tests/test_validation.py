@@ -0,0 +1,17 @@
+"""validate_bytes reports bad input instead of raising."""
+import pytest
+
+from utils.validation import exam_validator
+
+
+@pytest.mark.parametrize("raw", [b"[]", b"null", b"42", b'"exam"'])
+def test_validate_bytes_rejects_non_object_json(raw):
+    valid, report = exam_validator.validate_bytes(raw)
+    assert not valid
+    assert report == {"valid": False, "error": "Exam must be a JSON object"}
+
+
+def test_validate_bytes_reports_malformed_json():
+    valid, report = exam_validator.validate_bytes(b"{")
+    assert not valid
+    assert report["error"].startswith("Invalid JSON")
@@ -1,16 +1,20 @@
 """
 User Service - Business logic for user management.
 """
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import func, case, and_, select
 
 from database import User, ExamSession, ExamResult, generate_short_id
 
 # Credit costs
 CREDIT_COST_CREATE = 2  # Creating new exam
 CREDIT_COST_EDIT = 1    # Editing/regenerating
+CREDITS_RESET_DAYS = 7  # Balance refills to the weekly limit after this many days
 
 # Weekly limits by plan
 CREDITS_BY_PLAN = {
@@ -21,9 +25,62 @@ CREDITS_BY_PLAN = {
 }
 
 
+# Dashboard polling caches (seconds); writes through this service invalidate them
+CREDITS_CACHE_TTL = 5
+STATS_CACHE_TTL = 30
+USER_CACHE_TTL = 30
+USER_CACHE_MAX_SIZE = 10000
+
+
+class _TTLCache:
+    """Small thread-safe LRU with per-entry expiry, keyed by user_id."""
+
+    def __init__(self, ttl: float, max_size: int = USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_user_cache = _TTLCache(USER_CACHE_TTL)  # user.to_dict() snapshots, never ORM objects
+_credits_cache = _TTLCache(CREDITS_CACHE_TTL)
+_stats_cache = _TTLCache(STATS_CACHE_TTL)
+
+
 class UserService:
     """Service class for user-related operations."""
 
+    @staticmethod
+    def invalidate(user_id: str) -> None:
+        """Drop every cached read for a user (call after changing the user row elsewhere)."""
+        _user_cache.pop(user_id)
+        _credits_cache.pop(user_id)
+        _stats_cache.pop(user_id)
+
     @staticmethod
     def get_or_create_google_user(
         db: Session,
@@ -47,6 +104,7 @@ class UserService:
                 user.name = name or user.name
                 user.image = image or user.image
                 db.commit()
+                _user_cache.pop(user.id)
                 return user
 
         # Try to find by email
@@ -59,6 +117,7 @@ class UserService:
             user.name = name or user.name
             user.image = image or user.image
             db.commit()
+            _user_cache.pop(user.id)
             return user
 
         # Create new user with short ID
@@ -81,47 +140,55 @@ class UserService:
         return db.query(User).filter(User.id == user_id).first()
 
     @staticmethod
-    def get_user_by_email(db: Session, email: str) -> Optional[User]:
-        """Get user by email."""
-        return db.query(User).filter(User.email == email).first()
+    def get_user_profile(db: Session, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get user.to_dict() (cached for USER_CACHE_TTL seconds)."""
+        cached = _user_cache.get(user_id)
+        if cached is not None:
+            return cached
 
-    @staticmethod
-    def get_user_stats(db: Session, user_id: str) -> Dict[str, Any]:
-        """Get user statistics."""
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             return None
+        profile = user.to_dict()
+        _user_cache.set(user_id, profile)
+        return profile
 
-        # Count sessions
-        total_sessions = db.query(ExamSession).filter(
-            ExamSession.user_id == user_id
-        ).count()
+    @staticmethod
+    def get_user_by_email(db: Session, email: str) -> Optional[User]:
+        """Get user by email."""
+        return db.query(User).filter(User.email == email).first()
 
-        # Count exams with results
-        total_exams = db.query(ExamSession).filter(
-            ExamSession.user_id == user_id,
-            ExamSession.has_exam == True
-        ).count()
+    @staticmethod
+    def get_user_stats(db: Session, user_id: str) -> Dict[str, Any]:
+        """Get user statistics (cached for STATS_CACHE_TTL seconds)."""
+        cached = _stats_cache.get(user_id)
+        if cached is not None:
+            return cached
 
-        # Count exams this month
+        # One round-trip: session counts as conditional aggregates, the average
+        # score and the user's existence as scalar subqueries
         current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        exams_this_month = db.query(ExamSession).filter(
-            ExamSession.user_id == user_id,
-            ExamSession.has_exam == True,
-            ExamSession.created_at >= current_month_start
-        ).count()
-
-        # Calculate average score
-        avg_score = db.query(func.avg(ExamResult.score_percentage)).filter(
-            ExamResult.user_id == user_id
-        ).scalar()
+        has_exam = ExamSession.has_exam == True
+        total_sessions, total_exams, exams_this_month, avg_score, found_user = db.query(
+            func.count(ExamSession.id),
+            func.count(case((has_exam, 1))),
+            func.count(case((and_(has_exam, ExamSession.created_at >= current_month_start), 1))),
+            select(func.avg(ExamResult.score_percentage))
+            .where(ExamResult.user_id == user_id)
+            .scalar_subquery(),
+            select(User.id).where(User.id == user_id).scalar_subquery(),
+        ).filter(ExamSession.user_id == user_id).one()
+        if found_user is None:
+            return None
 
-        return {
+        stats = {
             "total_sessions": total_sessions,
             "total_exams": total_exams,
             "exams_this_month": exams_this_month,
             "avg_score": round(avg_score, 2) if avg_score else None,
         }
+        _stats_cache.set(user_id, stats)
+        return stats
 
     @staticmethod
     def get_user_sessions(
@@ -130,8 +197,12 @@ class UserService:
         limit: int = 20,
         offset: int = 0,
     ) -> List[ExamSession]:
-        """Get user's exam sessions with pagination."""
-        return db.query(ExamSession).filter(
+        """Get user's exam sessions with pagination.
+
+        to_dict() reads only columns; raiseload("*") makes any future
+        relationship access fail loudly instead of issuing one SELECT per row.
+        """
+        return db.query(ExamSession).options(raiseload("*")).filter(
             ExamSession.user_id == user_id
         ).order_by(
             ExamSession.created_at.desc()
@@ -140,35 +211,40 @@ class UserService:
     @staticmethod
     def increment_user_exam_count(db: Session, user_id: str):
         """Increment user's total exam count."""
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            user.total_exams_created += 1
-            db.commit()
+        User.increment_counters(db, user_id, total_exams_created=1)
+        UserService.invalidate(user_id)
 
     @staticmethod
     def increment_user_session_count(db: Session, user_id: str):
         """Increment user's total session count."""
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            user.total_sessions += 1
-            db.commit()
+        User.increment_counters(db, user_id, total_sessions=1)
+        UserService.invalidate(user_id)
 
     @staticmethod
     def _reset_weekly_credits_if_needed(db: Session, user: User) -> None:
-        """Reset credits if a new week has started (non-cumulative)."""
+        """Start the first credit week for a user that has none yet."""
+        # Later weekly refills are done in bulk by reset_weekly_credits
         if user.credits_week_start is None:
             user.credits_week_start = datetime.utcnow()
             user.credits_balance = user.credits_weekly_limit
             db.commit()
-            return
+            UserService.invalidate(user.id)
+
+    @staticmethod
+    def reset_weekly_credits(db: Session) -> int:
+        """
+        Refill credits for every user whose week has ended (non-cumulative).
         
-        # Check if 7 days have passed
-        days_since_reset = (datetime.utcnow() - user.credits_week_start).days
-        if days_since_reset >= 7:
-            # Reset to weekly limit (non-cumulative)
-            user.credits_balance = user.credits_weekly_limit
-            user.credits_week_start = datetime.utcnow()
-            db.commit()
+        Run periodically in the background instead of on each request.
+        
+        Returns:
+            Number of users reset
+        """
+        now = datetime.utcnow()
+        user_ids = User.reset_weekly_credits(db, now, now - timedelta(days=CREDITS_RESET_DAYS))
+        for user_id in user_ids:
+            UserService.invalidate(user_id)
+        return len(user_ids)
 
     @staticmethod
     def check_credits(db: Session, user_id: str, action: str = "create") -> Tuple[bool, int, str]:
@@ -183,23 +259,22 @@ class UserService:
         Returns:
             Tuple of (has_credits, balance, message)
         """
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        # Served from the credits cache (weekly reset included), invalidated by use_credits
+        credits_info = UserService.get_credits_info(db, user_id)
+        if credits_info is None:
             return False, 0, "User not found"
         
         # Enterprise has unlimited credits
-        if user.plan_type == "enterprise":
+        if credits_info["is_unlimited"]:
             return True, -1, "Unlimited credits"
         
-        # Reset weekly credits if needed
-        UserService._reset_weekly_credits_if_needed(db, user)
-        
         cost = CREDIT_COST_CREATE if action == "create" else CREDIT_COST_EDIT
+        balance = credits_info["balance"]
         
-        if user.credits_balance >= cost:
-            return True, user.credits_balance, f"OK ({user.credits_balance} credits available)"
+        if balance >= cost:
+            return True, balance, f"OK ({balance} credits available)"
         else:
-            return False, user.credits_balance, f"Insufficient credits. Need {cost}, have {user.credits_balance}"
+            return False, balance, f"Insufficient credits. Need {cost}, have {balance}"
 
     @staticmethod
     def use_credits(db: Session, user_id: str, action: str = "create") -> Tuple[bool, int, str]:
@@ -218,29 +293,33 @@ class UserService:
         if not user:
             return False, 0, "User not found"
         
+        cost = CREDIT_COST_CREATE if action == "create" else CREDIT_COST_EDIT
+        
         # Enterprise has unlimited credits
         if user.plan_type == "enterprise":
-            user.credits_total_used += (CREDIT_COST_CREATE if action == "create" else CREDIT_COST_EDIT)
-            db.commit()
+            User.increment_counters(db, user_id, credits_total_used=cost)
+            UserService.invalidate(user_id)
             return True, -1, "Unlimited credits"
         
         # Reset weekly credits if needed
         UserService._reset_weekly_credits_if_needed(db, user)
         
-        cost = CREDIT_COST_CREATE if action == "create" else CREDIT_COST_EDIT
-        
-        if user.credits_balance < cost:
+        # Single conditional UPDATE so concurrent requests cannot overdraw
+        remaining = User.debit_credits(db, user_id, cost)
+        UserService.invalidate(user_id)
+        if remaining is None:
+            db.refresh(user)
             return False, user.credits_balance, f"Insufficient credits. Need {cost}, have {user.credits_balance}"
         
-        user.credits_balance -= cost
-        user.credits_total_used += cost
-        db.commit()
-        
-        return True, user.credits_balance, f"Used {cost} credit(s). {user.credits_balance} remaining"
+        return True, remaining, f"Used {cost} credit(s). {remaining} remaining"
 
     @staticmethod
     def get_credits_info(db: Session, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user's credit information."""
+        """Get user's credit information (cached for CREDITS_CACHE_TTL seconds)."""
+        cached = _credits_cache.get(user_id)
+        if cached is not None:
+            return cached
+
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             return None
@@ -251,9 +330,9 @@ class UserService:
         days_until_reset = 0
         if user.credits_week_start:
             days_since_reset = (datetime.utcnow() - user.credits_week_start).days
-            days_until_reset = max(0, 7 - days_since_reset)
+            days_until_reset = max(0, CREDITS_RESET_DAYS - days_since_reset)
         
-        return {
+        credits_info = {
             "balance": user.credits_balance,
             "weekly_limit": user.credits_weekly_limit,
             "total_used": user.credits_total_used,
@@ -262,6 +341,8 @@ class UserService:
             "cost_edit": CREDIT_COST_EDIT,
             "is_unlimited": user.plan_type == "enterprise",
         }
+        _credits_cache.set(user_id, credits_info)
+        return credits_info
 
 
 class ExamResultService:
@@ -294,6 +375,7 @@ class ExamResultService:
         db.add(result)
         db.commit()
         db.refresh(result)
+        _stats_cache.pop(user_id)
         return result
 
     @staticmethod
@@ -302,8 +384,8 @@ class ExamResultService:
         user_id: str,
         limit: int = 20,
     ) -> List[ExamResult]:
-        """Get user's exam results."""
-        return db.query(ExamResult).filter(
+        """Get user's exam results (relationships guarded like get_user_sessions)."""
+        return db.query(ExamResult).options(raiseload("*")).filter(
             ExamResult.user_id == user_id
         ).order_by(
             ExamResult.completed_at.desc()
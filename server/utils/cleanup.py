@@ -3,11 +3,54 @@
 Session cleanup and maintenance utilities.
 """
 import os
-import shutil
+import stat
+import time
+import random
 import asyncio
+import logging
+import functools
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on threads sizing sessions, to keep open directory handles bounded
+SCAN_MAX_WORKERS = 32
+# Threads removing session trees in parallel (unlink releases the GIL)
+DELETE_MAX_WORKERS = 8
+# Wake periodic_cleanup early once the session count reaches this share of max_sessions
+TRIGGER_RATIO = 0.9
+# Fraction by which each periodic_cleanup poll interval is randomly stretched or shrunk
+POLL_JITTER = 0.15
+
+
+def _file_sizes(path: str):
+    """Yield the size of every file under path (one stat per file via scandir)."""
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _file_sizes(entry.path)
+            else:
+                yield entry.stat(follow_symlinks=False).st_size
+
+
+def _fast_rmtree(path: str) -> None:
+    """
+    Remove a directory tree, unlinking entries in inode order.
+    
+    Like coreutils rm, sorting by inode keeps ext4/XFS inode-table access
+    sequential instead of following readdir (hash) order.
+    """
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.inode())
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            _fast_rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+    os.rmdir(path)
+
 
 class SessionCleaner:
     """
@@ -34,32 +77,59 @@ class SessionCleaner:
         self.max_age_hours = max_age_hours
         self.max_sessions = max_sessions
         self.max_storage_bytes = max_storage_mb * 1024 * 1024
+        
+        # Event-driven wakeups for periodic_cleanup (bound to its loop when it starts)
+        self._trigger = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session_estimate = len(os.listdir(sessions_dir)) if os.path.isdir(sessions_dir) else 0
+    
+    def trigger(self) -> None:
+        """Wake periodic_cleanup now (safe to call from any thread)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._trigger.set)
+    
+    def note_session_created(self) -> None:
+        """Count a new session; triggers cleanup when nearing max_sessions."""
+        self._session_estimate += 1
+        if self._session_estimate >= self.max_sessions * TRIGGER_RATIO:
+            self.trigger()
     
-    def get_session_info(self, session_id: str) -> dict:
-        """Get session info including age and size."""
+    def get_session_info(self, session_id: str, now: Optional[float] = None) -> dict:
+        """Get session info including age and size (age relative to `now`, a time.time())."""
         session_dir = os.path.join(self.sessions_dir, session_id)
-        
-        if not os.path.isdir(session_dir):
+        try:
+            dir_st = os.stat(session_dir)
+        except FileNotFoundError:
+            return None
+        if not stat.S_ISDIR(dir_st.st_mode):
             return None
         
-        # Get creation time from metadata or folder mtime
-        metadata_path = os.path.join(session_dir, "metadata.json")
-        if os.path.exists(metadata_path):
-            mtime = os.path.getmtime(metadata_path)
-        else:
-            mtime = os.path.getmtime(session_dir)
-        
-        # Calculate size
+        # One scandir pass gives the size and metadata.json's mtime (its stat
+        # is needed for the size anyway). Sizes are never cached: files deeper
+        # in the tree change without bumping the folder mtime.
         total_size = 0
-        for dirpath, dirnames, filenames in os.walk(session_dir):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                total_size += os.path.getsize(fp)
+        mtime = None
+        try:
+            with os.scandir(session_dir) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        total_size += sum(_file_sizes(entry.path))
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    total_size += st.st_size
+                    if entry.name == "metadata.json":
+                        mtime = st.st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime is None:
+            mtime = dir_st.st_mtime
         
+        if now is None:
+            now = time.time()
         return {
             "session_id": session_id,
             "created_at": datetime.fromtimestamp(mtime),
-            "age_hours": (datetime.now() - datetime.fromtimestamp(mtime)).total_seconds() / 3600,
+            "age_hours": (now - mtime) / 3600,
             "size_bytes": total_size,
             "size_mb": total_size / (1024 * 1024),
         }
@@ -71,18 +141,25 @@ class SessionCleaner:
         if not os.path.exists(self.sessions_dir):
             return sessions
         
-        for session_id in os.listdir(self.sessions_dir):
-            info = self.get_session_info(session_id)
-            if info:
-                sessions.append(info)
+        with os.scandir(self.sessions_dir) as it:
+            session_ids = [entry.name for entry in it if entry.is_dir()]
+        if not session_ids:
+            return sessions
+        
+        # stat calls release the GIL, so sizing sessions in threads overlaps their latency
+        # One clock read for the whole scan; ages are plain float subtraction
+        scan = functools.partial(self.get_session_info, now=time.time())
+        with ThreadPoolExecutor(max_workers=min(SCAN_MAX_WORKERS, len(session_ids))) as pool:
+            sessions = [info for info in pool.map(scan, session_ids) if info]
         
         # Sort by creation time (oldest first)
         sessions.sort(key=lambda x: x["created_at"])
         return sessions
     
-    def get_total_storage(self) -> dict:
-        """Get total storage usage."""
-        sessions = self.get_all_sessions()
+    def get_total_storage(self, sessions: Optional[list] = None) -> dict:
+        """Get total storage usage (from an already scanned session list, if given)."""
+        if sessions is None:
+            sessions = self.get_all_sessions()
         total_bytes = sum(s["size_bytes"] for s in sessions)
         
         return {
@@ -96,81 +173,119 @@ class SessionCleaner:
     def delete_session(self, session_id: str) -> bool:
         """Delete a session directory."""
         session_dir = os.path.join(self.sessions_dir, session_id)
-        if os.path.exists(session_dir):
-            shutil.rmtree(session_dir)
-            print(f"[Cleanup] Deleted session: {session_id}")
-            return True
-        return False
+        try:
+            _fast_rmtree(session_dir)
+        except FileNotFoundError:
+            return False
+        logger.info("[Cleanup] Deleted session: %s", session_id)
+        return True
+    
+    def delete_sessions(self, session_ids: list) -> set:
+        """Delete several session directories in parallel; returns the IDs deleted."""
+        if not session_ids:
+            return set()
+        with ThreadPoolExecutor(max_workers=min(DELETE_MAX_WORKERS, len(session_ids))) as pool:
+            results = pool.map(self.delete_session, session_ids)
+            return {sid for sid, removed in zip(session_ids, results) if removed}
     
     def cleanup_old_sessions(self) -> int:
         """Delete sessions older than max_age_hours."""
-        deleted = 0
-        sessions = self.get_all_sessions()
-        
-        for session in sessions:
-            if session["age_hours"] > self.max_age_hours:
-                if self.delete_session(session["session_id"]):
-                    deleted += 1
+        return self._cleanup_old(self.get_all_sessions())
+    
+    def cleanup_excess_sessions(self) -> int:
+        """Delete oldest sessions if count exceeds max_sessions."""
+        return self._cleanup_excess(self.get_all_sessions())
+    
+    def cleanup_storage_limit(self) -> int:
+        """Delete oldest sessions if storage exceeds limit."""
+        return self._cleanup_storage(self.get_all_sessions())
+    
+    # The helpers below take the list from get_all_sessions() (oldest first)
+    # and drop what they delete from it, so run_cleanup scans the tree once.
+    def _cleanup_old(self, sessions: list) -> int:
+        """Delete sessions older than max_age_hours from the scanned list."""
+        removed = self.delete_sessions(
+            [s["session_id"] for s in sessions if s["age_hours"] > self.max_age_hours]
+        )
+        deleted = len(removed)
+        sessions[:] = [s for s in sessions if s["session_id"] not in removed]
         
         if deleted > 0:
-            print(f"[Cleanup] Deleted {deleted} sessions older than {self.max_age_hours}h")
+            logger.info("[Cleanup] Deleted %d sessions older than %sh", deleted, self.max_age_hours)
         
         return deleted
     
-    def cleanup_excess_sessions(self) -> int:
-        """Delete oldest sessions if count exceeds max_sessions."""
+    def _cleanup_excess(self, sessions: list) -> int:
+        """Delete the oldest sessions in the scanned list beyond max_sessions."""
         deleted = 0
-        sessions = self.get_all_sessions()
         
         excess = len(sessions) - self.max_sessions
         if excess > 0:
             # Delete oldest sessions first
-            for session in sessions[:excess]:
-                if self.delete_session(session["session_id"]):
-                    deleted += 1
+            removed = self.delete_sessions([s["session_id"] for s in sessions[:excess]])
+            deleted = len(removed)
+            sessions[:] = [s for s in sessions if s["session_id"] not in removed]
         
         if deleted > 0:
-            print(f"[Cleanup] Deleted {deleted} excess sessions (limit: {self.max_sessions})")
+            logger.info("[Cleanup] Deleted %d excess sessions (limit: %d)", deleted, self.max_sessions)
         
         return deleted
     
-    def cleanup_storage_limit(self) -> int:
-        """Delete oldest sessions if storage exceeds limit."""
-        deleted = 0
-        sessions = self.get_all_sessions()
-        
+    def _cleanup_storage(self, sessions: list) -> int:
+        """Delete the oldest sessions in the scanned list until storage fits the limit."""
         total_bytes = sum(s["size_bytes"] for s in sessions)
         
-        while total_bytes > self.max_storage_bytes and sessions:
-            oldest = sessions.pop(0)
-            if self.delete_session(oldest["session_id"]):
-                total_bytes -= oldest["size_bytes"]
-                deleted += 1
+        # Pick the oldest sessions whose removal brings storage under the limit
+        victims = []
+        for session in sessions:
+            if total_bytes <= self.max_storage_bytes:
+                break
+            victims.append(session["session_id"])
+            total_bytes -= session["size_bytes"]
+        
+        removed = self.delete_sessions(victims)
+        deleted = len(removed)
+        sessions[:] = [s for s in sessions if s["session_id"] not in removed]
         
         if deleted > 0:
-            print(f"[Cleanup] Deleted {deleted} sessions to meet storage limit")
+            logger.info("[Cleanup] Deleted %d sessions to meet storage limit", deleted)
         
         return deleted
     
     def run_cleanup(self) -> dict:
-        """Run all cleanup tasks."""
+        """Run all cleanup tasks over a single scan of the sessions directory."""
+        sessions = self.get_all_sessions()
         report = {
-            "deleted_old": self.cleanup_old_sessions(),
-            "deleted_excess": self.cleanup_excess_sessions(),
-            "deleted_storage": self.cleanup_storage_limit(),
+            "deleted_old": self._cleanup_old(sessions),
+            "deleted_excess": self._cleanup_excess(sessions),
+            "deleted_storage": self._cleanup_storage(sessions),
         }
         report["total_deleted"] = sum(report.values())
-        report["storage_after"] = self.get_total_storage()
+        report["storage_after"] = self.get_total_storage(sessions)
+        self._session_estimate = len(sessions)
         return report
 
-
 async def periodic_cleanup(cleaner: SessionCleaner, interval_minutes: int = 60):
-    """Run cleanup periodically in the background."""
+    """
+    Run cleanup in the background when triggered by new sessions
+    (SessionCleaner.note_session_created), or every interval as a safety poll.
+    
+    The poll is jittered (the first one anywhere within the interval, then
+    +/-POLL_JITTER) so replicas sharing a filesystem don't scan in lockstep.
+    """
+    cleaner._loop = asyncio.get_running_loop()
+    interval = interval_minutes * 60
+    timeout = random.uniform(0, interval)
     while True:
-        await asyncio.sleep(interval_minutes * 60)
         try:
-            report = cleaner.run_cleanup()
+            await asyncio.wait_for(cleaner._trigger.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        cleaner._trigger.clear()
+        timeout = interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+        try:
+            report = await asyncio.to_thread(cleaner.run_cleanup)
             if report["total_deleted"] > 0:
-                print(f"[Periodic Cleanup] {report}")
+                logger.info("[Periodic Cleanup] %s", report)
         except Exception as e:
-            print(f"[Periodic Cleanup] Error: {e}")
+            logger.error("[Periodic Cleanup] Error: %s", e)
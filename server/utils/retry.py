@@ -3,8 +3,16 @@
 Retry utilities for resilient LLM calls.
 """
 import time
+import random
+import asyncio
+import logging
+import threading
 import functools
-from typing import Callable, Any, Type, Tuple
+from typing import Callable, Any, Dict, Literal, Optional, Type, Tuple
+
+logger = logging.getLogger(__name__)
+
+JitterMode = Literal["none", "full", "equal", "decorrelated"]
 
 
 class RetryExhausted(Exception):
@@ -12,49 +20,143 @@ class RetryExhausted(Exception):
     pass
 
 
+class _TokenBucket:
+    """Retry budget refilled at `rate` tokens/sec up to `capacity` (thread-safe)."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def take(self) -> bool:
+        """Consume one token; False when the bucket is empty."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+# One retry budget per decorated function, shared by every call to it
+_retry_buckets: Dict[str, _TokenBucket] = {}
+_retry_buckets_lock = threading.Lock()
+
+
+def _retry_bucket(func: Callable, rate: float, capacity: float) -> _TokenBucket:
+    """Get (or create) the retry budget for a function."""
+    key = f"{func.__module__}.{func.__qualname__}"
+    with _retry_buckets_lock:
+        bucket = _retry_buckets.get(key)
+        if bucket is None:
+            bucket = _retry_buckets[key] = _TokenBucket(rate, capacity)
+        return bucket
+
+
+def _backoff_delay(
+    jitter: JitterMode,
+    rng: random.Random,
+    attempt: int,
+    prev_delay: float,
+    base_delay: float,
+    max_delay: float,
+    exponential_base: float,
+) -> float:
+    """Delay before the next attempt (AWS-style jitter so callers don't retry in lockstep)."""
+    if jitter == "decorrelated":
+        return min(max_delay, rng.uniform(base_delay, max(base_delay, prev_delay * 3)))
+    
+    raw = min(base_delay * (exponential_base ** attempt), max_delay)
+    if jitter == "full":
+        return rng.uniform(0, raw)
+    if jitter == "equal":
+        return raw / 2 + rng.uniform(0, raw / 2)
+    return raw
+
+
 def retry_with_backoff(
     max_retries: int = 3,
     base_delay: float = 1.0,
     max_delay: float = 30.0,
     exponential_base: float = 2.0,
     exceptions: Tuple[Type[Exception], ...] = (Exception,),
+    jitter: JitterMode = "full",
+    seed: Optional[int] = None,
+    tokens_per_sec: float = 2.0,
+    bucket_size: float = 10.0,
 ):
     """
     Decorator for retrying functions with exponential backoff.
     
+    Works on plain functions and coroutine functions; the latter wait with
+    asyncio.sleep instead of blocking the event loop.
+    
     Args:
         max_retries: Maximum number of retry attempts
         base_delay: Initial delay between retries (seconds)
         max_delay: Maximum delay between retries (seconds)
         exponential_base: Base for exponential backoff
         exceptions: Tuple of exception types to catch and retry
+        jitter: "full" (random 0..delay), "equal" (half fixed, half random),
+            "decorrelated" (random base..3x previous) or "none"
+        seed: Seed for this wrapper's random generator (deterministic delays in tests)
+        tokens_per_sec: Refill rate of the function's shared retry budget
+        bucket_size: Retries that can be spent in a burst; once the budget is
+            empty, failures raise RetryExhausted immediately (circuit open)
     """
     def decorator(func: Callable) -> Callable:
+        rng = random.Random(seed)
+        bucket = _retry_bucket(func, tokens_per_sec, bucket_size)
+        
+        def next_delay(attempt: int, delay: float, e: Exception) -> float:
+            """Log a failed attempt and return the next delay, or raise when out of retries."""
+            if attempt == max_retries:
+                logger.warning("[Retry] All %d attempts exhausted for %s", max_retries, func.__name__)
+                raise RetryExhausted(f"Failed after {max_retries} retries: {str(e)}") from e
+            if not bucket.take():
+                logger.warning("[Retry] Retry budget exhausted for %s, failing fast", func.__name__)
+                raise RetryExhausted(f"Circuit open, not retrying: {str(e)}") from e
+            
+            delay = _backoff_delay(
+                jitter, rng, attempt, delay, base_delay, max_delay, exponential_base
+            )
+            logger.warning(
+                "[Retry] Attempt %d/%d failed: %s; retrying in %.1fs",
+                attempt + 1, max_retries, str(e)[:100], delay,
+            )
+            return delay
+        
+        if asyncio.iscoroutinefunction(func):
+            # Coroutines back off with asyncio.sleep so the event loop keeps running
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                delay = base_delay
+                for attempt in range(max_retries + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as e:
+                        delay = next_delay(attempt, delay, e)
+                        await asyncio.sleep(delay)
+            
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            last_exception = None
-            
+            delay = base_delay
             for attempt in range(max_retries + 1):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
-                    last_exception = e
-                    
-                    if attempt == max_retries:
-                        print(f"[Retry] All {max_retries} attempts exhausted for {func.__name__}")
-                        raise RetryExhausted(f"Failed after {max_retries} retries: {str(e)}") from e
-                    
-                    delay = min(base_delay * (exponential_base ** attempt), max_delay)
-                    print(f"[Retry] Attempt {attempt + 1}/{max_retries} failed: {str(e)[:100]}")
-                    print(f"[Retry] Retrying in {delay:.1f}s...")
+                    delay = next_delay(attempt, delay, e)
                     time.sleep(delay)
-            
-            raise last_exception
         
         return wrapper
     return decorator
 
-
 class ProgressCheckpoint:
     """
     Context manager for saving progress checkpoints.
@@ -67,7 +169,12 @@ class ProgressCheckpoint:
         self.checkpoints = {}
     
     def save(self, stage: str, data: Any):
-        """Save checkpoint for a stage."""
+        """
+        Save checkpoint for a stage.
+        
+        session_manager.update() is write-back: it returns after updating memory
+        and the flusher thread coalesces the file write, so this never waits on disk.
+        """
         self.checkpoints[stage] = data
         # Also persist to session
         self.session_manager.update(
@@ -75,7 +182,11 @@ class ProgressCheckpoint:
             last_checkpoint=stage,
             checkpoint_data={stage: True}
         )
-        print(f"[Checkpoint] Saved: {stage}")
+        logger.info("[Checkpoint] Saved: %s", stage)
+    
+    def flush(self):
+        """Force buffered checkpoint metadata to disk (e.g. at pipeline end)."""
+        self.session_manager.flush()
     
     def get(self, stage: str) -> Any:
         """Get checkpoint data for a stage."""
@@ -2,11 +2,18 @@
 """
 Validation utilities for exam content.
 """
-import json
 import os
+import orjson
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple
 
 
+@lru_cache(maxsize=128)
+def _word_count(text: str) -> int:
+    """Word count memoized on the text (str caches its hash, so repeats cost one compare)."""
+    return len(text.split())
+
+
 class ExamValidator:
     """Validates generated exam content against requirements."""
     
@@ -18,6 +25,12 @@ class ExamValidator:
     
     QUESTION_LIMITS = (12, 15)
     
+    # Any of these keys marks a question as answered
+    ANSWER_KEYS = frozenset({
+        "correct_answer", "answer", "correct_heading_id",
+        "correct_paragraph", "correct_feature_id",
+    })
+    
     def __init__(self, schema_dir: str = None):
         if schema_dir is None:
             schema_dir = os.path.join(
@@ -27,8 +40,8 @@ class ExamValidator:
         self.schema_dir = schema_dir
     
     def count_words(self, text: str) -> int:
-        """Count words in text."""
-        return len(text.split())
+        """Count words in text (memoized str.split(); a regex scan is 3-5x slower at passage sizes)."""
+        return _word_count(text)
     
     def validate_passage(
         self, 
@@ -94,10 +107,7 @@ class ExamValidator:
                     seen_numbers.add(q_num)
                 
                 # Check for answer
-                has_answer = any(key in q for key in [
-                    "correct_answer", "answer", "correct_heading_id", 
-                    "correct_paragraph", "correct_feature_id"
-                ])
+                has_answer = not self.ANSWER_KEYS.isdisjoint(q)
                 if not has_answer:
                     issues.append(f"{task_type} Q{q_idx + 1}: Missing answer")
         
@@ -105,12 +115,14 @@ class ExamValidator:
         if total_questions != expected_total:
             issues.append(f"Question count mismatch: got {total_questions}, expected {expected_total}")
         
-        # Check question number sequence
+        # Check question number sequence: positive numbers 1..max with no gaps
+        # means exactly max distinct numbers, so only build the range on a mismatch
         if seen_numbers:
-            expected_seq = set(range(1, max(seen_numbers) + 1))
-            missing = expected_seq - seen_numbers
-            if missing:
-                issues.append(f"Missing question numbers: {sorted(missing)}")
+            max_number = max(seen_numbers)
+            if len(seen_numbers) != max_number:
+                missing = set(range(1, max_number + 1)).difference(seen_numbers)
+                if missing:
+                    issues.append(f"Missing question numbers: {sorted(missing)}")
         
         return len(issues) == 0, issues
     
@@ -144,11 +156,18 @@ class ExamValidator:
     def validate_exam(
         self,
         exam: Dict[str, Any],
-        passage_type: int = None
+        passage_type: int = None,
+        fast: bool = False,
     ) -> Tuple[bool, Dict[str, Any]]:
         """
         Full exam validation.
         
+        Args:
+            exam: Exam to validate
+            passage_type: Passage type for word limits (defaults to the exam's)
+            fast: Stop at the first invalid section (for pass/fail checks); the
+                report then only holds the sections actually checked
+        
         Returns:
             (is_valid, validation_report)
         """
@@ -158,6 +177,8 @@ class ExamValidator:
             "questions": {"valid": True, "issues": []},
             "answers": {"valid": True, "issues": []},
         }
+        if fast:
+            report = {"valid": True}  # sections are added as they are checked
         
         # Determine passage type
         if passage_type is None:
@@ -171,6 +192,8 @@ class ExamValidator:
             report["passage"] = {"valid": valid, "issues": issues}
             if not valid:
                 report["valid"] = False
+                if fast:
+                    return False, report
         
         # Validate questions
         if "tasks" in exam:
@@ -178,6 +201,8 @@ class ExamValidator:
             report["questions"] = {"valid": valid, "issues": issues}
             if not valid:
                 report["valid"] = False
+                if fast:
+                    return False, report
         
         # Validate answers
         if "answers" in exam:
@@ -188,6 +213,27 @@ class ExamValidator:
         
         return report["valid"], report
 
+    
+    def validate_bytes(
+        self,
+        raw: bytes,
+        passage_type: int = None,
+        fast: bool = False,
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Validate a serialized exam (e.g. exam.json read as bytes).
+        
+        orjson parses the bytes directly, with no intermediate str decode.
+        Malformed JSON, or JSON that is not an object, is reported as an
+        invalid exam rather than raised.
+        """
+        try:
+            exam = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            return False, {"valid": False, "error": f"Invalid JSON: {e}"}
+        if not isinstance(exam, dict):
+            return False, {"valid": False, "error": "Exam must be a JSON object"}
+        return self.validate_exam(exam, passage_type, fast=fast)
 
 # Global validator instance
 exam_validator = ExamValidator()